@@ -0,0 +1,67 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import aiomysql
+from database import HOST, USER, PASSWORD, DBNAME, POOL_MIN_SIZE, POOL_MAX_SIZE
+from services.metrics import record_query
+
+####################### ASYNC MySQL POOL ######################
+class InstrumentedAsyncCursor(aiomysql.DictCursor):
+    async def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - started)
+
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool():
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await aiomysql.create_pool(
+                    host=HOST,
+                    user=USER,
+                    password=PASSWORD,
+                    db=DBNAME,
+                    minsize=POOL_MIN_SIZE,
+                    maxsize=POOL_MAX_SIZE,
+                    cursorclass=InstrumentedAsyncCursor,
+                    connect_timeout=5,
+                    pool_recycle=3600,
+                    autocommit=False
+                )
+    return _pool
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+####################### CONNECTIONS ######################
+@asynccontextmanager
+async def async_connection():
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        await conn.ping(reconnect=True)
+        try:
+            yield conn
+        finally:
+            # Never hand an open transaction back to the pool
+            if not conn.closed:
+                await conn.rollback()
+
+
+####################### FASTAPI DEPENDENCY ######################
+async def get_async_db():
+    async with async_connection() as conn:
+        yield conn
@@ -0,0 +1,99 @@
+# Read latency under concurrent uploads, against a running server:
+#
+#   uvicorn main:app --workers 1
+#   python benchmarks/concurrency.py --url http://127.0.0.1:8000 --rows 50000
+#
+# Dashboard reads are timed twice: on an idle worker, then while large
+# sales uploads are in flight. Run it on the old and new code to compare
+# p99; with blocking handlers on the event loop the loaded p99 grows to
+# the length of an upload.
+import argparse
+import asyncio
+import io
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+VEHICLE_TYPES = ["SUV", "Sedan", "Hatchback", "EV"]
+
+
+def build_sales_csv(rows, employees=500, seed=7):
+    rnd = random.Random(seed)
+    out = io.StringIO()
+    out.write("Employee_ID,Branch,Role,Vehicle_Model,Quantity,Sale_Date,Vehicle_Type\n")
+    start = date(2025, 9, 1)
+    for _ in range(rows):
+        emp = rnd.randrange(employees)
+        out.write(
+            f"BENCH{emp:05d},Branch {emp % 20},Sales Executive,Model {rnd.randrange(10)},"
+            f"{rnd.randint(1, 3)},{start + timedelta(days=rnd.randrange(30))},"
+            f"{rnd.choice(VEHICLE_TYPES)}\n"
+        )
+    return out.getvalue().encode()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def read_loop(client, path, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def measure_reads(client, path, readers, seconds, uploads=0, payload=None):
+    stop = asyncio.Event()
+    latencies = []
+    tasks = [asyncio.create_task(read_loop(client, path, stop, latencies)) for _ in range(readers)]
+
+    async def upload(i):
+        files = {"file": (f"bench_{i}.csv", payload, "text/csv")}
+        await client.post("/data-ingestion/upload_sales_data", files=files)
+
+    upload_tasks = [asyncio.create_task(upload(i)) for i in range(uploads)]
+    await asyncio.sleep(seconds)
+    await asyncio.gather(*upload_tasks)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"{label:<18} n={len(latencies):<6} "
+        f"p50={percentile(latencies, 50):8.1f}ms "
+        f"p95={percentile(latencies, 95):8.1f}ms "
+        f"p99={percentile(latencies, 99):8.1f}ms"
+    )
+
+
+async def main(args):
+    payload = build_sales_csv(args.rows)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        idle = await measure_reads(client, args.path, args.readers, args.seconds)
+        loaded = await measure_reads(
+            client, args.path, args.readers, args.seconds,
+            uploads=args.uploads, payload=payload
+        )
+
+    report("idle", idle)
+    report("during uploads", loaded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/results/GETdashboard_stats")
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--seconds", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
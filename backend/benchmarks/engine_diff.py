@@ -0,0 +1,241 @@
+# Differential check of the calculation engine against the original
+# per-employee loop, on generated data.
+#
+#   python benchmarks/engine_diff.py --cases 400 --sharded-cases 60
+#
+# Every case is a fresh random period: overlapping and open-ended slabs,
+# sales by employees missing from the master, NULL roles and vehicle
+# types, unit ties and populations small enough for top_n = 1.
+# compute_incentives runs on every case and compute_incentives_sharded on
+# the first --sharded-cases of them; each has to return exactly what the
+# loop returns (same employees, order, totals and breakdown lines), with
+# top_performer set exactly for the employees the loop paid the top-10%
+# bonus. Exit status 1 on any mismatch.
+import os
+import sys
+import random
+import argparse
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services.engine import summarize_sales, compute_incentives, compute_incentives_sharded
+from services.slab_index import SlabIndex
+
+VEHICLE_TYPES = ["SUV", "Sedan", "Hatchback", "EV", "Truck"]
+ROLES = ["Sales Executive", "Senior Sales Executive", "Team Lead"]
+
+
+############################ ORIGINAL LOOP #########################
+# Steps 3-8 of calculate_incentives_api as it was before the columnar
+# engine, minus the database writes: the reference both engines must match.
+def reference_incentives(sales, salespeople, rules):
+    sales_by_employee = {}
+    for s in sales:
+        sales_by_employee.setdefault(s["employee_id"], []).append(s)
+
+    emp_map = {e["id"]: e for e in salespeople}
+
+    branch_totals = {}
+    branch_rankings = {}
+    for emp_id, emp_sales in sales_by_employee.items():
+        emp = emp_map.get(emp_id)
+        if not emp:
+            continue
+        total_units = sum(s["quantity"] for s in emp_sales)
+        branch = emp["branch"]
+        branch_totals[branch] = branch_totals.get(branch, 0) + total_units
+        branch_rankings.setdefault(branch, []).append((emp_id, total_units))
+
+    for branch in branch_rankings:
+        branch_rankings[branch].sort(key=lambda x: x[1], reverse=True)
+
+    all_perf = []
+    for emp_id, emp_sales in sales_by_employee.items():
+        all_perf.append((emp_id, sum(s["quantity"] for s in emp_sales)))
+    all_perf.sort(key=lambda x: x[1], reverse=True)
+    top_n = max(1, int(len(all_perf) * 0.1))
+    top_10_ids = {e[0] for e in all_perf[:top_n]}
+
+    results = []
+    for emp_id, emp_sales in sales_by_employee.items():
+        emp = emp_map.get(emp_id)
+        if not emp:
+            continue
+
+        role = emp["role"]
+        branch = emp["branch"]
+
+        sales_counts = {}
+        sales_days = set()
+        product_mix = set()
+        for s in emp_sales:
+            sales_counts[s["vehicle_type"]] = sales_counts.get(s["vehicle_type"], 0) + s["quantity"]
+            sales_days.add(s["sale_date"])
+            product_mix.add(s["vehicle_type"])
+
+        structured_total = 0
+        applied_rules = []
+        for vehicle_type, count in sales_counts.items():
+            slabs = [
+                r for r in rules
+                if r["role"] == role
+                and r["vehicle_type"] == vehicle_type
+                and r["min_units"] <= count
+                and (r["max_units"] is None or count <= r["max_units"])
+            ]
+            slabs.sort(key=lambda x: x["min_units"], reverse=True)
+            if slabs:
+                r = slabs[0]
+                amount = r["incentive_amount"] + (count - r["min_units"]) * r["bonus_per_unit"]
+                structured_total += amount
+                applied_rules.append({
+                    "rule_id": r["id"],
+                    "type": "Structured Slab",
+                    "vehicle_type": vehicle_type,
+                    "amount": round(amount, 2)
+                })
+
+        total_incentive = structured_total
+
+        branch_units = branch_totals.get(branch, 0)
+        if branch_units >= 400:
+            total_incentive += 10000
+            applied_rules.append({"type": "Branch Milestone", "amount": 10000})
+        elif branch_units >= 300:
+            total_incentive += 6000
+            applied_rules.append({"type": "Branch Milestone", "amount": 6000})
+        elif branch_units >= 200:
+            total_incentive += 3000
+            applied_rules.append({"type": "Branch Milestone", "amount": 3000})
+
+        if len(sales_days) >= 20:
+            total_incentive += 4000
+            applied_rules.append({"type": "Consistency Bonus", "amount": 4000})
+
+        if len(product_mix) >= 3:
+            total_incentive += 3000
+            applied_rules.append({"type": "Cross Sell Bonus", "amount": 3000})
+
+        rank_bonus = {0: 15000, 1: 10000, 2: 5000}
+        for i, (eid, _) in enumerate(branch_rankings.get(branch, [])):
+            if eid == emp_id and i in rank_bonus:
+                total_incentive += rank_bonus[i]
+                applied_rules.append({"type": "Branch Rank Bonus", "rank": i + 1, "amount": rank_bonus[i]})
+                break
+
+        if emp_id in top_10_ids:
+            bonus = total_incentive * 0.5
+            total_incentive += bonus
+            applied_rules.append({"type": "Top 10 Percent Bonus", "amount": round(bonus, 2)})
+
+        results.append({
+            "employee_id": emp_id,
+            "total_incentive": round(total_incentive, 2),
+            "applied_rules": applied_rules
+        })
+
+    return results
+
+
+############################ GENERATED CASES #########################
+def generate_case(seed):
+    rnd = random.Random(seed)
+    # A third of the cases are small: few employees per branch, top_n = 1
+    small = seed % 3 == 0
+    employees = rnd.randint(5, 40) if small else rnd.randint(100, 400)
+    branches = rnd.randint(1, 4) if small else rnd.randint(5, 15)
+    rows = employees * rnd.randint(5, 30)
+    # Every fourth case has NULL roles and vehicle types, on salespeople,
+    # sales and rules alike (the columns are nullable)
+    nulls = seed % 4 == 1
+    roles = ROLES + [None] if nulls else ROLES
+    vehicle_types = VEHICLE_TYPES + [None] if nulls else VEHICLE_TYPES
+
+    salespeople = [
+        {"id": f"E{i:04d}", "branch": f"Branch {rnd.randrange(branches):02d}", "role": rnd.choice(roles)}
+        for i in range(employees)
+    ]
+    sellers = [e["id"] for e in salespeople] + [f"X{i:03d}" for i in range(rnd.randint(0, 10))]
+
+    sales = [
+        {
+            "employee_id": rnd.choice(sellers),
+            "vehicle_type": rnd.choice(vehicle_types),
+            "quantity": rnd.choice([1, 1, 1, 2, 3]),
+            "sale_date": date(2025, 9, rnd.randint(1, 30))
+        }
+        for _ in range(rows)
+    ]
+
+    rules = []
+    for i in range(rnd.randint(0, 80)):
+        min_units = rnd.randint(0, 40)
+        rules.append({
+            "id": f"R{i:03d}",
+            "role": rnd.choice(roles),
+            "vehicle_type": rnd.choice(vehicle_types),
+            "min_units": min_units,
+            "max_units": None if rnd.random() < 0.2 else min_units + rnd.randint(0, 30),
+            "incentive_amount": round(rnd.uniform(0, 5000), 2),
+            "bonus_per_unit": round(rnd.uniform(0, 300), 3)
+        })
+
+    return sales, salespeople, rules
+
+
+def compare(expected, actual):
+    # First difference as a message, None when identical
+    if len(expected) != len(actual):
+        return f"{len(actual)} results, expected {len(expected)}"
+
+    for want, got in zip(expected, actual):
+        got = dict(got)
+        flag = got.pop("top_performer", None)
+        if got != want:
+            return f"{got['employee_id']}: {got} != {want}"
+        paid = any(line["type"] == "Top 10 Percent Bonus" for line in want["applied_rules"])
+        if flag is not paid:
+            return f"{got['employee_id']}: top_performer={flag}, bonus paid={paid}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine vs original loop differential check")
+    parser.add_argument("--cases", type=int, default=400)
+    parser.add_argument("--sharded-cases", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case")
+    options = parser.parse_args()
+
+    mismatches = {"compute_incentives": 0, "compute_incentives_sharded": 0}
+    for n in range(options.cases):
+        seed = options.seed + n
+        sales, salespeople, rules = generate_case(seed)
+        expected = reference_incentives(sales, salespeople, rules)
+
+        units, sale_days = summarize_sales(sales)
+        slab_index = SlabIndex(rules)
+
+        runs = [("compute_incentives", lambda: compute_incentives(units, sale_days, salespeople, slab_index))]
+        if n < options.sharded_cases:
+            runs.append((
+                "compute_incentives_sharded",
+                lambda: compute_incentives_sharded(units, sale_days, salespeople, slab_index, options.workers)
+            ))
+
+        for name, run in runs:
+            problem = compare(expected, run())
+            if problem:
+                mismatches[name] += 1
+                print(f"seed {seed} {name}: {problem}")
+
+    sharded = min(options.cases, options.sharded_cases)
+    print(f"compute_incentives          {mismatches['compute_incentives']} mismatches in {options.cases} cases")
+    print(f"compute_incentives_sharded  {mismatches['compute_incentives_sharded']} mismatches in {sharded} cases")
+    sys.exit(1 if any(mismatches.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
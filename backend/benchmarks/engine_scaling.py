@@ -0,0 +1,75 @@
+# Branch-sharded engine scaling: compute_incentives against
+# compute_incentives_sharded at each worker count, on the same generated
+# period.
+#
+#   python benchmarks/engine_scaling.py --employees 5000 --rows 500000 --workers 1 2 4 8
+#
+# "first" includes spawning the pool (each worker count gets a new one);
+# "best" is the best of --repeat runs on the warm pool, and the speedup is
+# against compute_incentives in this process. Slab rules and bonus
+# parameters are the generator's / version-1 defaults.
+import os
+import sys
+import time
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generator import generate_salespeople, iter_sales_rows, generate_rules
+from services.engine import summarize_sales, compute_incentives, compute_incentives_sharded
+from services.slab_index import SlabIndex
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Branch-sharded engine scaling")
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--rules", type=int, default=60)
+    parser.add_argument("--period", default="2025-09")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    options = parser.parse_args()
+
+    salespeople = generate_salespeople(options.branches, options.employees, options.seed)
+    sales = [
+        {"employee_id": r[0], "vehicle_type": r[6], "quantity": r[4], "sale_date": r[5]}
+        for r in iter_sales_rows(salespeople, options.rows, options.period, options.seed)
+    ]
+    slab_index = SlabIndex([
+        {
+            "id": r["Rule_ID"], "role": r["Role"], "vehicle_type": r["Vehicle_Type"],
+            "min_units": r["Min_Units"], "max_units": r["Max_Units"],
+            "incentive_amount": r["Incentive_Amount_INR"],
+            "bonus_per_unit": r["Bonus_Per_Unit_INR"]
+        }
+        for r in generate_rules(options.rules, options.period)
+    ])
+    units, sale_days = summarize_sales(sales)
+
+    single = min(
+        timed(lambda: compute_incentives(units, sale_days, salespeople, slab_index))
+        for _ in range(options.repeat)
+    )
+    print(f"{os.cpu_count()} CPUs, {len(units)} employee/vehicle rows, {len(salespeople)} salespeople")
+    print(f"{'engine':28} {'first s':>9} {'best s':>9} {'speedup':>8}")
+    print(f"{'compute_incentives':28} {'':>9} {single:>9.3f} {1:>8.2f}")
+
+    for workers in options.workers:
+        run = lambda: compute_incentives_sharded(units, sale_days, salespeople, slab_index, workers)
+        first = timed(run)
+        best = min(timed(run) for _ in range(options.repeat))
+        print(f"{f'sharded, {workers} workers':28} {first:>9.3f} {best:>9.3f} {single / best:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
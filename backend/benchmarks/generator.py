@@ -0,0 +1,151 @@
+# Synthetic dealer network: salespeople, a month of sales and slab rules,
+# as the CSVs the upload endpoints accept (SalesRowSchema / RuleRowSchema).
+#
+#   python benchmarks/generator.py --out-dir bench_data --branches 40 \
+#       --employees 5000 --rows 500000 --rules 120 --period 2025-09
+#
+# Same seed, same files. Sales volume is skewed (a few strong sellers per
+# branch, a long tail) so ranks, milestones and the top 10% all trigger.
+import os
+import csv
+import io
+import random
+import argparse
+import calendar
+from datetime import date
+
+VEHICLE_TYPES = ["SUV", "Sedan", "Hatchback", "EV"]
+VEHICLE_MODELS = {
+    "SUV": ["Creta", "Seltos", "XUV700", "Harrier"],
+    "Sedan": ["City", "Verna", "Slavia", "Ciaz"],
+    "Hatchback": ["Swift", "i20", "Baleno", "Altroz"],
+    "EV": ["Nexon EV", "ZS EV", "Tiago EV", "Kona"],
+}
+ROLES = ["Sales Executive", "Senior Sales Executive", "Team Lead"]
+
+SALES_HEADER = [
+    "Employee_ID", "Branch", "Role", "Vehicle_Model",
+    "Quantity", "Sale_Date", "Vehicle_Type"
+]
+RULES_HEADER = [
+    "Rule_ID", "Role", "Vehicle_Type", "Min_Units", "Max_Units",
+    "Incentive_Amount_INR", "Bonus_Per_Unit_INR", "Valid_From", "Valid_To"
+]
+
+
+############################ NETWORK #########################
+def generate_salespeople(branches, employees, seed=7):
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": f"GEN{i:06d}",
+            "branch": f"Branch {i % branches:03d}",
+            "role": rnd.choices(ROLES, weights=[70, 22, 8])[0],
+        }
+        for i in range(employees)
+    ]
+
+
+############################ SALES #########################
+def iter_sales_rows(salespeople, rows, period="2025-09", seed=7):
+    rnd = random.Random(seed)
+    year, month = (int(p) for p in period.split("-"))
+    days = calendar.monthrange(year, month)[1]
+
+    # Pareto-ish weights: a handful of employees carry most of the volume
+    weights = [rnd.paretovariate(1.5) for _ in salespeople]
+    picks = rnd.choices(range(len(salespeople)), weights=weights, k=rows)
+
+    for i in picks:
+        person = salespeople[i]
+        vehicle_type = rnd.choice(VEHICLE_TYPES)
+        yield [
+            person["id"],
+            person["branch"],
+            person["role"],
+            rnd.choice(VEHICLE_MODELS[vehicle_type]),
+            rnd.choices([1, 2, 3], weights=[80, 15, 5])[0],
+            date(year, month, rnd.randint(1, days)).isoformat(),
+            vehicle_type,
+        ]
+
+
+def write_sales_csv(out, salespeople, rows, period="2025-09", seed=7):
+    writer = csv.writer(out)
+    writer.writerow(SALES_HEADER)
+    writer.writerows(iter_sales_rows(salespeople, rows, period, seed))
+
+
+def sales_csv_bytes(salespeople, rows, period="2025-09", seed=7):
+    out = io.StringIO()
+    write_sales_csv(out, salespeople, rows, period, seed)
+    return out.getvalue().encode()
+
+
+############################ RULES #########################
+def generate_rules(count, period="2025-09"):
+    # Consecutive unit bands per (role, vehicle type), valid for the
+    # period's year; later bands pay more
+    year = int(period.split("-")[0])
+    combos = [(r, v) for r in ROLES for v in VEHICLE_TYPES]
+    bands = max(1, count // len(combos))
+
+    rules = []
+    for role, vehicle_type in combos:
+        for band in range(bands):
+            if len(rules) == count:
+                return rules
+            min_units = band * 5
+            rules.append({
+                "Rule_ID": f"GR{len(rules) + 1:05d}",
+                "Role": role,
+                "Vehicle_Type": vehicle_type,
+                "Min_Units": min_units,
+                "Max_Units": min_units + 4,
+                "Incentive_Amount_INR": float(1000 * (band + 1)),
+                "Bonus_Per_Unit_INR": float(100 * (band + 1)),
+                "Valid_From": date(year, 1, 1).isoformat(),
+                "Valid_To": date(year, 12, 31).isoformat(),
+            })
+    return rules
+
+
+def write_rules_csv(out, rules):
+    writer = csv.DictWriter(out, fieldnames=RULES_HEADER)
+    writer.writeheader()
+    writer.writerows(rules)
+
+
+def rules_csv_bytes(rules):
+    out = io.StringIO()
+    write_rules_csv(out, rules)
+    return out.getvalue().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dealer network")
+    parser.add_argument("--out-dir", default="bench_data")
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--rules", type=int, default=60)
+    parser.add_argument("--period", default="2025-09")
+    parser.add_argument("--seed", type=int, default=7)
+    options = parser.parse_args()
+
+    os.makedirs(options.out_dir, exist_ok=True)
+    salespeople = generate_salespeople(options.branches, options.employees, options.seed)
+
+    sales_path = os.path.join(options.out_dir, f"sales_{options.period}.csv")
+    with open(sales_path, "w", newline="") as f:
+        write_sales_csv(f, salespeople, options.rows, options.period, options.seed)
+
+    rules_path = os.path.join(options.out_dir, "rules.csv")
+    with open(rules_path, "w", newline="") as f:
+        write_rules_csv(f, generate_rules(options.rules, options.period))
+
+    print(f"Wrote {sales_path} ({options.rows} rows) and {rules_path}")
+
+
+if __name__ == "__main__":
+    main()
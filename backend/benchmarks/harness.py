@@ -0,0 +1,364 @@
+# Benchmark harness: ingestion, calculation and results reads at a given
+# scale, with throughput, latency percentiles and peak memory.
+#
+#   python benchmarks/harness.py --backend memory --employees 5000 --rows 500000
+#   DB_NAME=incentive_scratch python benchmarks/harness.py --backend mysql
+#
+# memory - in-process stand-in: the same validation, engine and
+#          serialization code the routes use, on generated data, no database.
+# mysql  - the FastAPI app in-process against the DB_* database (a scratch
+#          one: migrations are applied and generated sales are uploaded).
+#
+# --save-baseline stores the numbers in benchmarks/baselines.json under
+# backend + scale; later runs at the same scale are compared against it
+# and the exit status is 1 when p50 latency or peak memory regress by more
+# than --tolerance.
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import tracemalloc
+import platform
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generator import (
+    generate_salespeople, iter_sales_rows, sales_csv_bytes,
+    generate_rules, rules_csv_bytes
+)
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+PAGE_SIZE = 100
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+############################ IN-PROCESS STAND-IN #########################
+class MemoryBackend:
+    name = "memory"
+    ingest_repeatable = True
+
+    def __init__(self, options):
+        from services.sales_ingestion import validate_sales_frame, row_hashes, RowOccurrences
+        from services.readers import iter_upload_frames
+        from services.engine import summarize_sales, compute_incentives
+        from services.slab_index import SlabIndex
+        from services.summaries import summarize_period
+        from routes.data_ingestion import INGEST_CHUNK_SIZE, REQUIRED_SALES_COLUMNS
+        from routes.results import RESULT_LIST
+
+        self._read = iter_upload_frames
+        self._validate = validate_sales_frame
+        self._row_hashes = row_hashes
+        self._occurrences = RowOccurrences
+        self._summarize_sales = summarize_sales
+        self._compute = compute_incentives
+        self._summarize_period = summarize_period
+        self._chunk_size = INGEST_CHUNK_SIZE
+        self._columns = REQUIRED_SALES_COLUMNS
+        self._result_list = RESULT_LIST
+
+        self.period = options.period
+        self.salespeople = generate_salespeople(options.branches, options.employees, options.seed)
+        self.sales_csv = sales_csv_bytes(self.salespeople, options.rows, options.period, options.seed)
+        self.sales = [
+            {"employee_id": r[0], "vehicle_type": r[6], "quantity": r[4], "sale_date": r[5]}
+            for r in iter_sales_rows(self.salespeople, options.rows, options.period, options.seed)
+        ]
+        self.slab_index = SlabIndex([
+            {
+                "id": r["Rule_ID"], "role": r["Role"], "vehicle_type": r["Vehicle_Type"],
+                "min_units": r["Min_Units"], "max_units": r["Max_Units"],
+                "incentive_amount": r["Incentive_Amount_INR"],
+                "bonus_per_unit": r["Bonus_Per_Unit_INR"]
+            }
+            for r in generate_rules(options.rules, options.period)
+        ])
+        self.rows = []
+
+    def ingest(self):
+        processed = 0
+        occurrences = self._occurrences()
+        reader = self._read(io.BytesIO(self.sales_csv), "sales.csv", self._columns, self._chunk_size)
+        for df in reader:
+            frame, _ = self._validate(df)
+            self._row_hashes(frame, occurrences)
+            processed += len(frame)
+        return processed
+
+    def calculate(self):
+        units, sale_days = self._summarize_sales(self.sales)
+        results = self._compute(units, sale_days, self.salespeople, self.slab_index)
+        self.rows = sorted(
+            (
+                {
+                    "employee_id": r["employee_id"],
+                    "period_month": self.period,
+                    "total_incentive": r["total_incentive"],
+                    "breakdown_json": json.dumps(r["applied_rules"]),
+                    "status": "Success"
+                }
+                for r in results
+            ),
+            key=lambda r: r["employee_id"]
+        )
+        return len(results)
+
+    def read_pages(self):
+        latencies = []
+        for start in range(0, len(self.rows), PAGE_SIZE):
+            started = time.perf_counter()
+            page = self.rows[start:start + PAGE_SIZE]
+            self._result_list.dump_json(self._result_list.validate_python(page))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def dashboard(self):
+        self._summarize_period(
+            [(r["employee_id"], r["total_incentive"]) for r in self.rows],
+            self.salespeople
+        )
+
+
+############################ MYSQL (APP IN-PROCESS) #########################
+class MySQLBackend:
+    name = "mysql"
+    # The same file again is answered as a duplicate without being parsed,
+    # so only the first upload measures ingestion
+    ingest_repeatable = False
+
+    def __init__(self, options):
+        from fastapi.testclient import TestClient
+        from database import get_connection
+        from migrate import migrate
+        from services.cache import results_cache
+        import main
+
+        conn = get_connection()
+        try:
+            migrate(conn, log=lambda message: None)
+        finally:
+            conn.close()
+
+        self.period = options.period
+        self.client = TestClient(main.app)
+        self.cache = results_cache
+        salespeople = generate_salespeople(options.branches, options.employees, options.seed)
+        self.sales_csv = sales_csv_bytes(salespeople, options.rows, options.period, options.seed)
+        self.rules_csv = rules_csv_bytes(generate_rules(options.rules, options.period))
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.url}: {response.status_code} {response.text[:200]}")
+        return response
+
+    def ingest(self):
+        self._check(self.client.post(
+            "/data-ingestion/upload_structured_rule",
+            files={"file": ("rules.csv", self.rules_csv, "text/csv")}
+        ))
+        response = self._check(self.client.post(
+            "/data-ingestion/upload_sales_data",
+            files={"file": ("sales.csv", self.sales_csv, "text/csv")}
+        ))
+        return response.json()["processed"]
+
+    def calculate(self):
+        response = self._check(self.client.post(
+            "/calculator/calculate-incentives", json={"period": self.period}
+        ))
+        return response.json().get("processed_salespeople", 0)
+
+    def read_pages(self):
+        # Cold reads: the response cache is cleared before every page
+        latencies = []
+        cursor = None
+        while True:
+            self.cache.clear()
+            params = {"period": self.period, "limit": PAGE_SIZE}
+            if cursor:
+                params["cursor"] = cursor
+            started = time.perf_counter()
+            response = self._check(self.client.get("/results/GETresults", params=params))
+            latencies.append(time.perf_counter() - started)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return latencies
+
+    def dashboard(self):
+        self.cache.clear()
+        self._check(self.client.get("/results/GETdashboard_stats", params={"period": self.period}))
+
+
+BACKENDS = {"memory": MemoryBackend, "mysql": MySQLBackend}
+
+
+############################ MEASUREMENT #########################
+def _peak_memory_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def _summary(latencies, items, peak_mb):
+    ms = [s * 1000 for s in latencies]
+    median = percentile(latencies, 50)
+    return {
+        "runs": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "throughput_per_s": round(items / median, 1) if items and median else None,
+        "peak_memory_mb": peak_mb
+    }
+
+
+def run_scenario(fn, repeat, repeatable=True):
+    # Timed runs first, then one run under tracemalloc for peak memory. A
+    # one-shot operation gets a single run, timed and traced together.
+    if not repeatable:
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            items = fn()
+            elapsed = time.perf_counter() - started
+            peak = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        finally:
+            tracemalloc.stop()
+        return [elapsed], items, peak
+
+    latencies, items = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies, items, _peak_memory_mb(fn)
+
+
+def run_benchmarks(backend, repeat):
+    report = {}
+
+    latencies, items, peak = run_scenario(backend.ingest, repeat, backend.ingest_repeatable)
+    report["ingest"] = _summary(latencies, items, peak)
+
+    latencies, items, peak = run_scenario(backend.calculate, repeat)
+    report["calculate"] = _summary(latencies, items, peak)
+
+    page_latencies = []
+    for _ in range(repeat):
+        page_latencies.extend(backend.read_pages())
+    peak = _peak_memory_mb(backend.read_pages)
+    report["results_pages"] = _summary(page_latencies, PAGE_SIZE, peak)
+
+    latencies, _, peak = run_scenario(lambda: backend.dashboard() or 1, repeat * 10)
+    report["dashboard"] = _summary(latencies, 1, peak)
+
+    return report
+
+
+############################ BASELINES #########################
+def scale_key(options):
+    return (
+        f"{options.backend}:b{options.branches}-e{options.employees}"
+        f"-r{options.rows}-rules{options.rules}"
+    )
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for scenario, current in report.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "peak_memory_mb"):
+            before, after = previous.get(metric), current.get(metric)
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}.{metric}: {before} -> {after} "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_report(report):
+    print(f"{'scenario':14} {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} "
+          f"{'items/s':>12} {'peak MB':>9}")
+    for scenario, s in report.items():
+        print(
+            f"{scenario:14} {s['runs']:>5} {s['p50_ms']:>10} {s['p95_ms']:>10} "
+            f"{s['p99_ms']:>10} {str(s['throughput_per_s']):>12} {str(s['peak_memory_mb']):>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incentive calculator benchmarks")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="memory")
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--rules", type=int, default=60)
+    parser.add_argument("--period", default="2025-09")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--out", help="also write the report as JSON here")
+    options = parser.parse_args()
+
+    backend = BACKENDS[options.backend](options)
+    report = run_benchmarks(backend, options.repeat)
+    print_report(report)
+
+    if options.out:
+        with open(options.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    key = scale_key(options)
+    baselines = load_baselines()
+    status = 0
+    if key in baselines and not options.save_baseline:
+        regressions = compare(report, baselines[key]["report"], options.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print("  " + line)
+            status = 1
+        else:
+            print(f"\nWithin {options.tolerance:.0%} of baseline {key}")
+
+    if options.save_baseline:
+        baselines[key] = {
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "report": report
+        }
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved as {key}")
+
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
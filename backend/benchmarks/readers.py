@@ -0,0 +1,169 @@
+# Upload parsing benchmark: the previous pandas CSV path against the Arrow
+# readers in services/readers.py, on the same generated sales data.
+#
+#   python benchmarks/readers.py --employees 5000 --rows 1000000
+#   python benchmarks/readers.py --rows 200000 --formats csv parquet
+#
+# Every scenario runs in a fresh (spawned) process so its peak RSS is its
+# own (inputs are generated in a child too: Linux carries ru_maxrss across
+# exec, so a large parent would mask it); the figure reported is the growth of ru_maxrss over the run, i.e.
+# what parsing + validating the upload added on top of the interpreter.
+# Arrow's allocator keeps freed pages around, so the Arrow pool's own peak
+# is reported next to it.
+# Parse and validate times are reported separately, chunk by chunk, the
+# way the /upload_sales_data route consumes them.
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generator import generate_salespeople, write_sales_csv
+
+# scenario -> (input format, reader)
+SCENARIOS = {
+    "pandas_csv": ("csv", "pandas"),
+    "arrow_csv": ("csv", "arrow"),
+    "arrow_csv_stream": ("csv", "arrow_stream"),
+    "arrow_parquet": ("parquet", "arrow"),
+    "xlsx": ("xlsx", "arrow"),
+}
+
+
+############################ INPUT FILES #########################
+def write_inputs(workdir, options):
+    import pandas as pd
+
+    paths = {"csv": os.path.join(workdir, "sales.csv")}
+    salespeople = generate_salespeople(options.branches, options.employees, options.seed)
+    with open(paths["csv"], "w", newline="") as out:
+        write_sales_csv(out, salespeople, options.rows, options.period, options.seed)
+
+    if "parquet" in options.formats or "xlsx" in options.formats:
+        frame = pd.read_csv(paths["csv"], dtype=str)
+        if "parquet" in options.formats:
+            paths["parquet"] = os.path.join(workdir, "sales.parquet")
+            frame.to_parquet(paths["parquet"], index=False)
+        if "xlsx" in options.formats:
+            # openpyxl writes slowly; the sheet is capped at --xlsx-rows
+            paths["xlsx"] = os.path.join(workdir, "sales.xlsx")
+            frame.head(options.xlsx_rows).to_excel(paths["xlsx"], index=False)
+    return paths
+
+
+############################ CHILD PROCESS #########################
+def _frames(reader, path, chunk_size):
+    import pandas as pd
+    from services import readers
+    from routes.data_ingestion import REQUIRED_SALES_COLUMNS
+
+    f = open(path, "rb")
+    if reader == "pandas":
+        return pd.read_csv(f, chunksize=chunk_size)
+    if reader == "arrow_stream":
+        readers.READER_THREADED_MAX_BYTES = 0
+    return readers.iter_upload_frames(f, path, REQUIRED_SALES_COLUMNS, chunk_size)
+
+
+def _arrow_peak_mb():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    return pa.default_memory_pool().max_memory() / 2 ** 20
+
+
+def run_scenario(reader, path, chunk_size, results):
+    from services.sales_ingestion import validate_sales_frame
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    frames = _frames(reader, path, chunk_size)
+    parse = validate = 0.0
+    rows = valid = 0
+    while True:
+        started = time.perf_counter()
+        df = next(frames, None)
+        parse += time.perf_counter() - started
+        if df is None:
+            break
+
+        started = time.perf_counter()
+        frame, _ = validate_sales_frame(df)
+        validate += time.perf_counter() - started
+        rows += len(df)
+        valid += len(frame)
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        "rows": rows,
+        "valid": valid,
+        "parse_s": parse,
+        "validate_s": validate,
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        "rss_mb": (rss_after - rss_before) / (2 ** 20 if sys.platform == "darwin" else 2 ** 10),
+        "arrow_mb": _arrow_peak_mb()
+    })
+
+
+def _write_inputs(workdir, options, results):
+    results.put(write_inputs(workdir, options))
+
+
+def in_child(target, *args):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    child = ctx.Process(target=target, args=args + (results,))
+    child.start()
+    result = results.get()
+    child.join()
+    return result
+
+
+############################ REPORT #########################
+def print_report(report):
+    print(f"{'scenario':18} {'rows':>9} {'valid':>9} {'parse s':>9} {'validate s':>11} "
+          f"{'rows/s':>11} {'+RSS MB':>9} {'arrow MB':>9}")
+    for scenario, r in report.items():
+        total = r["parse_s"] + r["validate_s"]
+        print(
+            f"{scenario:18} {r['rows']:>9} {r['valid']:>9} {r['parse_s']:>9.3f} "
+            f"{r['validate_s']:>11.3f} {r['rows'] / total if total else 0:>11.0f} {r['rss_mb']:>9.1f} "
+            f"{r['arrow_mb'] if r['arrow_mb'] is None else round(r['arrow_mb'], 1)!s:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload reader benchmark")
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--xlsx-rows", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--period", default="2025-09")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", choices=["csv", "parquet", "xlsx"],
+                        default=["csv", "parquet", "xlsx"])
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = in_child(_write_inputs, workdir, options)
+        report = {}
+        for scenario, (fmt, reader) in SCENARIOS.items():
+            if fmt not in options.formats:
+                continue
+            # Best of --repeat runs for time; RSS of the same run
+            runs = [in_child(run_scenario, reader, paths[fmt], options.chunk_size) for _ in range(options.repeat)]
+            report[scenario] = min(runs, key=lambda r: r["parse_s"] + r["validate_s"])
+
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
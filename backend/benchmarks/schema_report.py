@@ -0,0 +1,289 @@
+# Before/after EXPLAIN and timing report for the schema migrations.
+#
+#   DB_NAME=incentive_scratch python benchmarks/schema_report.py --rows 500000
+#
+# Needs an EMPTY scratch database (DB_* settings as for the app): the
+# migrations up to BEFORE_VERSION are applied, a generated dataset is
+# loaded, the hot queries are EXPLAINed and timed, the remaining migrations
+# are applied
+# (--optional adds partitioning) and the queries are measured again. The
+# report is printed and written to --out as JSON.
+import os
+import sys
+import json
+import random
+import argparse
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection
+from migrate import migrate
+from services.aggregates import rebuild_aggregates
+
+VEHICLE_TYPES = ["SUV", "Sedan", "Hatchback", "EV"]
+ROLES = ["Sales Executive", "Senior Sales Executive", "Team Lead"]
+INSERT_BATCH = 5000
+
+PERIOD = "2025-09"
+PERIOD_START = date(2025, 9, 1)
+PERIOD_END = date(2025, 9, 30)
+
+# The "before" schema: baseline plus the tables the calculator reads
+# (change tracking, monthly aggregates), without any index migration
+BEFORE_VERSION = "0003"
+ANALYZED_TABLES = (
+    "sales_records, incentive_rules, calculation_results, "
+    "sales_monthly_units, sales_employee_days"
+)
+
+# (name, SQL, args) in the exact shape the calculator and routers issue them
+HOT_QUERIES = [
+    (
+        "period units",
+        """
+        SELECT a.employee_id, a.vehicle_type, a.units
+        FROM sales_monthly_units a
+        WHERE a.period_month = %s
+        ORDER BY a.first_record_id
+        """,
+        (PERIOD,)
+    ),
+    (
+        "period sale days",
+        """
+        SELECT a.employee_id, COUNT(*) AS sale_days
+        FROM sales_employee_days a
+        WHERE a.sale_date BETWEEN %s AND %s
+        GROUP BY a.employee_id
+        """,
+        (PERIOD_START, PERIOD_END)
+    ),
+    (
+        "branch units",
+        """
+        SELECT a.employee_id, a.vehicle_type, a.units
+        FROM sales_monthly_units a
+        JOIN salespeople p ON p.id = a.employee_id
+        WHERE a.period_month = %s
+        AND (p.branch IN (%s))
+        ORDER BY a.first_record_id
+        """,
+        (PERIOD, "Branch 3")
+    ),
+    (
+        "aggregate rebuild scan",
+        """
+        SELECT DATE_FORMAT(sale_date, '%%Y-%%m'), employee_id, vehicle_type,
+               SUM(quantity), MIN(id)
+        FROM sales_records
+        WHERE sale_date BETWEEN %s AND %s
+        GROUP BY DATE_FORMAT(sale_date, '%%Y-%%m'), employee_id, vehicle_type
+        """,
+        (PERIOD_START, PERIOD_END)
+    ),
+    (
+        "structured rule window",
+        """
+        SELECT *
+        FROM incentive_rules
+        WHERE rule_type='Structured'
+        AND valid_from <= %s
+        AND valid_to >= %s
+        """,
+        (PERIOD_END, PERIOD_START)
+    ),
+    (
+        "period results delete",
+        "DELETE FROM calculation_results WHERE period_month=%s",
+        (PERIOD,)
+    ),
+    (
+        "employee results delete",
+        """
+        DELETE FROM calculation_results
+        WHERE period_month=%s
+        AND employee_id IN (%s, %s, %s)
+        """,
+        (PERIOD, "GEN00001", "GEN00002", "GEN00003")
+    ),
+    (
+        "results page",
+        """
+        SELECT employee_id, period_month, total_incentive,
+               breakdown_json, status
+        FROM calculation_results
+        LIMIT %s OFFSET %s
+        """,
+        (100, 0)
+    ),
+]
+
+
+############################ DATASET #########################
+def load_dataset(conn, rows, employees, months, seed):
+    rnd = random.Random(seed)
+    db = conn.cursor()
+
+    people = [
+        (f"GEN{i:05d}", f"Branch {i % 25}", rnd.choice(ROLES))
+        for i in range(employees)
+    ]
+    db.executemany("INSERT INTO salespeople (id, branch, role) VALUES (%s, %s, %s)", people)
+
+    back = PERIOD_START.year * 12 + PERIOD_START.month - 1 - (months - 1)
+    first_month = date(back // 12, back % 12 + 1, 1)
+    span = (PERIOD_END - first_month).days + 1
+    batch = []
+    for _ in range(rows):
+        batch.append((
+            people[rnd.randrange(employees)][0],
+            f"Model {rnd.randrange(10)}",
+            rnd.randint(1, 3),
+            first_month + timedelta(days=rnd.randrange(span)),
+            rnd.choice(VEHICLE_TYPES)
+        ))
+        if len(batch) == INSERT_BATCH:
+            _insert_sales(db, batch)
+            batch = []
+    if batch:
+        _insert_sales(db, batch)
+
+    rules = []
+    for year in range(first_month.year, PERIOD_END.year + 1):
+        for role in ROLES:
+            for vehicle_type in VEHICLE_TYPES:
+                for min_units in (0, 5, 10, 20):
+                    rules.append((
+                        f"R{year}-{len(rules)}", role, vehicle_type, min_units,
+                        min_units + 4, 1000.0, 100.0,
+                        date(year, 1, 1), date(year, 12, 31), "Structured"
+                    ))
+    db.executemany(
+        """
+        INSERT INTO incentive_rules
+        (id, role, vehicle_type, min_units, max_units, incentive_amount,
+         bonus_per_unit, valid_from, valid_to, rule_type)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        """,
+        rules
+    )
+
+    results = []
+    year, month = first_month.year, first_month.month
+    while (year, month) <= (PERIOD_END.year, PERIOD_END.month):
+        period = f"{year:04d}-{month:02d}"
+        results.extend(
+            (e[0], period, 1000.0, "[]", "Success", date(year, month, 28))
+            for e in people
+        )
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    for i in range(0, len(results), INSERT_BATCH):
+        db.executemany(
+            """
+            INSERT INTO calculation_results
+            (employee_id, period_month, total_incentive,
+             breakdown_json, status, calculated_at)
+            VALUES (%s,%s,%s,%s,%s,%s)
+            """,
+            results[i:i + INSERT_BATCH]
+        )
+
+    conn.commit()
+    # The calculator reads the aggregates, not sales_records
+    rebuild_aggregates(conn)
+    db.execute("ANALYZE TABLE " + ANALYZED_TABLES)
+    db.fetchall()
+
+
+def _insert_sales(db, batch):
+    db.executemany(
+        """
+        INSERT INTO sales_records
+        (employee_id, vehicle_model, quantity, sale_date, vehicle_type)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        batch
+    )
+
+
+############################ MEASUREMENT #########################
+def measure(conn, repeat):
+    db = conn.cursor()
+    report = {}
+    for name, sql, args in HOT_QUERIES:
+        db.execute("EXPLAIN " + sql, args)
+        plan = [
+            {k: row.get(k) for k in ("table", "partitions", "type", "key", "rows", "Extra")}
+            for row in db.fetchall()
+        ]
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, args)
+            db.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+            # Deletes are measured, never kept
+            conn.rollback()
+
+        timings.sort()
+        report[name] = {
+            "plan": plan,
+            "median_ms": round(timings[len(timings) // 2], 2),
+            "min_ms": round(timings[0], 2)
+        }
+    return report
+
+
+def print_report(before, after):
+    print(f"{'query':26} {'before ms':>10} {'after ms':>10}  plan (before -> after)")
+    for name in before:
+        b, a = before[name], after[name]
+        plan_b = ", ".join(f"{p['type']}/{p['key']}" for p in b["plan"])
+        plan_a = ", ".join(f"{p['type']}/{p['key']}" for p in a["plan"])
+        print(f"{name:26} {b['median_ms']:>10} {a['median_ms']:>10}  {plan_b} -> {plan_a}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN/timing report for schema migrations")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--optional", action="store_true", help="also apply optional migrations")
+    parser.add_argument("--out", default="schema_report.json")
+    options = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        db = conn.cursor()
+        db.execute("SHOW TABLES")
+        if db.fetchall():
+            raise SystemExit("schema_report needs an empty scratch database")
+
+        migrate(conn, target=BEFORE_VERSION)
+        load_dataset(conn, options.rows, options.employees, options.months, options.seed)
+        before = measure(conn, options.repeat)
+
+        applied = migrate(conn, include_optional=options.optional)
+        db.execute("ANALYZE TABLE " + ANALYZED_TABLES)
+        db.fetchall()
+        after = measure(conn, options.repeat)
+    finally:
+        conn.close()
+
+    print_report(before, after)
+    with open(options.out, "w") as f:
+        json.dump({
+            "dataset": {"rows": options.rows, "employees": options.employees, "months": options.months},
+            "migrations": applied,
+            "before": before,
+            "after": after
+        }, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import pymysql
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from pymysql.cursors import DictCursor
+from services.metrics import record_query
 
 load_dotenv()
 
@@ -11,6 +16,22 @@ DBNAME = os.environ.get("DB_NAME")
 PASSWORD = os.environ.get("DB_PASSWORD")
 USER = os.environ.get("DB_USER")
 
+####################### POOL SETTINGS ######################
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+
+
+class InstrumentedCursor(DictCursor):
+    # Times every statement sent to the server; executemany reaches this
+    # once per multi-row INSERT batch (or per row for other statements)
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - started)
+
 
 def get_connection():
     return pymysql.connect(
@@ -18,9 +39,88 @@ def get_connection():
         user=USER,
         password=PASSWORD,
         database=DBNAME,
-        cursorclass=DictCursor,
+        cursorclass=InstrumentedCursor,
         connect_timeout=5
     )
 
-conn = get_connection()
-db = conn.cursor()
\ No newline at end of file
+
+class ConnectionPool:
+    # Thread-safe pool of pymysql connections. At most max_size connections
+    # are checked out at once; idle ones are pinged (and reconnected) before
+    # being handed out, broken ones are dropped and replaced.
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._warm_lock = threading.Lock()
+        self._warmed = False
+
+    def _warm(self):
+        with self._warm_lock:
+            if self._warmed:
+                return
+            for _ in range(self.min_size - self._idle.qsize()):
+                self._idle.put(get_connection())
+            self._warmed = True
+
+    def acquire(self):
+        if not self._warmed:
+            self._warm()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for a database connection")
+
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return get_connection()
+
+            try:
+                conn.ping(reconnect=True)
+            except pymysql.MySQLError:
+                self._discard(conn)
+                conn = get_connection()
+            return conn
+
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.open:
+                # Never hand an open transaction to the next borrower
+                conn.rollback()
+                self._idle.put(conn)
+        except pymysql.MySQLError:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+
+pool = ConnectionPool()
+
+
+####################### FASTAPI DEPENDENCY ######################
+def get_db():
+    with pool.connection() as conn:
+        yield conn
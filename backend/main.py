@@ -1,7 +1,11 @@
+import time
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from async_database import close_async_pool
+from services.metrics import registry, render_metrics
 
 load_dotenv()
 
@@ -13,6 +17,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 ########################## IMPORT ROUTES #################
@@ -25,6 +30,43 @@ app.include_router(data_ingestion_router, prefix="/data-ingestion")
 app.include_router(calculator_router, prefix="/calculator")
 app.include_router(results_router, prefix="/results")
 
+################### Metrics ####################
+def route_template(request):
+    # Route template, not the raw path, to keep label cardinality bounded.
+    # Depending on the FastAPI version the matched route's path may or may
+    # not carry the router prefix; the prefix is taken from the request path.
+    template = getattr(request.scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    path = request.scope["path"]
+    extra = path.rstrip("/").count("/") - template.rstrip("/").count("/")
+    prefix = "/".join(path.split("/")[:extra + 1]) if extra > 0 else ""
+    return prefix + template
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        path = route_template(request)
+        registry.observe(
+            "http_request_seconds", time.perf_counter() - started,
+            method=request.method, route=path
+        )
+        registry.inc("http_requests_total", method=request.method, route=path, status=status)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+   return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+async def shutdown():
+   await close_async_pool()
+
 @app.get("/")
 async def index():
    return {"message": "Hello World"}
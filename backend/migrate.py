@@ -0,0 +1,159 @@
+# Versioned schema migrations.
+#
+#   python migrate.py                 apply pending migrations
+#   python migrate.py --optional      ... including optional ones (partitioning)
+#   python migrate.py --target 0002   stop after version 0002
+#   python migrate.py --status        list applied / pending versions
+#
+# Migrations live in migrations/ as NNNN_name.sql (statements separated by
+# ';' at the end of a line) or NNNN_name.py (an upgrade(conn) function, and
+# OPTIONAL = True to skip it unless --optional is given). Applied versions
+# are recorded in schema_migrations. MySQL commits DDL implicitly, so a
+# migration that fails half way has to be finished or reverted by hand.
+import os
+import argparse
+import importlib.util
+import time
+from database import get_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+BASELINE_VERSION = "0001"
+
+
+############################ DISCOVERY #########################
+class Migration:
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.basename(path)
+        stem, self.kind = os.path.splitext(self.filename)
+        self.version, _, self.name = stem.partition("_")
+        self.optional = False
+        self._module = None
+        if self.kind == ".py":
+            self.optional = getattr(self.module(), "OPTIONAL", False)
+
+    def module(self):
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(f"migration_{self.version}", self.path)
+            self._module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._module)
+        return self._module
+
+    def statements(self):
+        with open(self.path, encoding="utf-8") as f:
+            lines = [l for l in f.read().splitlines() if not l.strip().startswith("--")]
+
+        statements, current = [], []
+        for line in lines:
+            current.append(line)
+            if line.rstrip().endswith(";"):
+                statements.append("\n".join(current).strip().rstrip(";"))
+                current = []
+        if "\n".join(current).strip():
+            statements.append("\n".join(current).strip())
+        return statements
+
+    def apply(self, conn):
+        if self.kind == ".py":
+            self.module().upgrade(conn)
+        else:
+            db = conn.cursor()
+            for statement in self.statements():
+                db.execute(statement)
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = [
+        Migration(os.path.join(directory, f))
+        for f in sorted(os.listdir(directory))
+        if f[:4].isdigit() and f.endswith((".sql", ".py"))
+    ]
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version in " + directory)
+    return migrations
+
+
+############################ BOOKKEEPING #########################
+def ensure_migrations_table(conn):
+    db = conn.cursor()
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(20) PRIMARY KEY,
+            name VARCHAR(255),
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            seconds FLOAT
+        )
+        """
+    )
+
+    # Databases created from the old schemas.sql already hold the baseline
+    # (0001 is that script unchanged); everything after it is pending
+    db.execute("SELECT COUNT(*) AS n FROM schema_migrations")
+    if db.fetchone()["n"] == 0:
+        db.execute("SHOW TABLES LIKE 'salespeople'")
+        if db.fetchone():
+            db.execute(
+                "INSERT INTO schema_migrations (version, name, seconds) VALUES (%s, %s, 0)",
+                (BASELINE_VERSION, "baseline")
+            )
+    conn.commit()
+
+
+def applied_versions(conn):
+    db = conn.cursor()
+    db.execute("SELECT version FROM schema_migrations")
+    return {r["version"] for r in db.fetchall()}
+
+
+def pending(conn, include_optional=False, target=None):
+    done = applied_versions(conn)
+    return [
+        m for m in discover()
+        if m.version not in done
+        and (include_optional or not m.optional)
+        and (target is None or m.version <= target)
+    ]
+
+
+############################ RUNNER #########################
+def migrate(conn, include_optional=False, target=None, log=print):
+    ensure_migrations_table(conn)
+    applied = []
+    for migration in pending(conn, include_optional, target):
+        log(f"Applying {migration.filename}")
+        started = time.perf_counter()
+        migration.apply(conn)
+        seconds = round(time.perf_counter() - started, 3)
+
+        db = conn.cursor()
+        db.execute(
+            "INSERT INTO schema_migrations (version, name, seconds) VALUES (%s, %s, %s)",
+            (migration.version, migration.name, seconds)
+        )
+        conn.commit()
+        applied.append({"version": migration.version, "name": migration.name, "seconds": seconds})
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--optional", action="store_true", help="include optional migrations")
+    parser.add_argument("--target", help="last version to apply")
+    parser.add_argument("--status", action="store_true", help="list applied and pending versions")
+    options = parser.parse_args()
+
+    connection = get_connection()
+    try:
+        if options.status:
+            ensure_migrations_table(connection)
+            done = applied_versions(connection)
+            for m in discover():
+                state = "applied" if m.version in done else "pending"
+                print(f"{m.version}  {state:8} {m.name}{' (optional)' if m.optional else ''}")
+        else:
+            applied = migrate(connection, options.optional, options.target)
+            print(f"{len(applied)} migration(s) applied")
+    finally:
+        connection.close()
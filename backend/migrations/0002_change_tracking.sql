@@ -0,0 +1,37 @@
+-- Change tracking for incremental recalculation.
+--
+-- sales_changes: one row per (period, employee, branch) that gained sales,
+-- logged by ingestion in the same transaction as the rows and tagged with
+-- the period's change version.
+-- sales_change_versions: per period, a counter ingestion bumps in that
+-- same transaction. The row stays locked until commit, so versions follow
+-- commit order; auto-increment ids follow INSERT order and can commit out
+-- of it, which would let a run's watermark pass a change still in flight.
+-- calculation_runs: per period, the change version a run covered plus the
+-- top-10% population size and cutoff it used.
+
+CREATE TABLE sales_changes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    period_month VARCHAR(20),
+    employee_id VARCHAR(50),
+    branch VARCHAR(100),
+    change_version BIGINT NOT NULL,
+    recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    INDEX idx_sales_changes_period (period_month, change_version)
+);
+
+CREATE TABLE sales_change_versions (
+    period_month VARCHAR(20) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- No stored run yet: the first calculation of every period is a full run
+CREATE TABLE calculation_runs (
+    period_month VARCHAR(20) PRIMARY KEY,
+    last_change_version BIGINT DEFAULT 0,
+    employee_count INT,
+    top_n INT,
+    top_cutoff_units INT,
+    completed_at DATETIME
+);
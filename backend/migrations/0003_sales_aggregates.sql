@@ -0,0 +1,40 @@
+-- Monthly sales aggregates read by the calculator, and the ingest_batch tag
+-- ingestion uses to fold each upload into them (services/aggregates.py).
+
+CREATE TABLE sales_monthly_units (
+    period_month VARCHAR(7),
+    employee_id VARCHAR(50),
+    vehicle_type VARCHAR(50),
+    units INT NOT NULL DEFAULT 0,
+    first_record_id INT NOT NULL,
+
+    PRIMARY KEY (period_month, employee_id, vehicle_type)
+);
+
+CREATE TABLE sales_employee_days (
+    sale_date DATE,
+    employee_id VARCHAR(50),
+
+    PRIMARY KEY (sale_date, employee_id)
+);
+
+ALTER TABLE sales_records
+    ADD COLUMN ingest_batch VARCHAR(36),
+    ADD INDEX idx_sales_records_batch (ingest_batch);
+
+-- Existing sales carry no batch tag; fold all of them in once, so
+-- historical periods keep their units once the calculator stops scanning
+-- sales_records. Rows with a NULL key column (never written by the upload
+-- path) cannot go into the primary keys and are left out.
+INSERT INTO sales_monthly_units
+    (period_month, employee_id, vehicle_type, units, first_record_id)
+SELECT DATE_FORMAT(sale_date, '%Y-%m'), employee_id, vehicle_type,
+       SUM(quantity), MIN(id)
+FROM sales_records
+WHERE sale_date IS NOT NULL AND employee_id IS NOT NULL AND vehicle_type IS NOT NULL
+GROUP BY DATE_FORMAT(sale_date, '%Y-%m'), employee_id, vehicle_type;
+
+INSERT INTO sales_employee_days (sale_date, employee_id)
+SELECT DISTINCT sale_date, employee_id
+FROM sales_records
+WHERE sale_date IS NOT NULL AND employee_id IS NOT NULL;
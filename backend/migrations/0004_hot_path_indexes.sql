@@ -0,0 +1,28 @@
+-- Indexes for the calculator's and results router's hot queries.
+
+-- Aggregate rebuilds and ad-hoc period scans: sale_date BETWEEN ...
+-- GROUP BY employee_id, vehicle_type with SUM(quantity) and MIN(id),
+-- answered from the index alone (InnoDB secondary indexes carry the PK)
+CREATE INDEX idx_sales_records_period
+    ON sales_records (sale_date, employee_id, vehicle_type, quantity);
+
+-- Rule validity window: rule_type='Structured' AND valid_from <= ? AND valid_to >= ?
+CREATE INDEX idx_incentive_rules_validity
+    ON incentive_rules (rule_type, valid_from, valid_to);
+
+-- One result per employee per period. Older duplicates are dropped first,
+-- keeping the most recently inserted row.
+DELETE older FROM calculation_results older
+JOIN calculation_results newer
+    ON newer.employee_id = older.employee_id
+    AND newer.period_month = older.period_month
+    AND newer.id > older.id;
+
+-- The unique key also backs the employee foreign key; MySQL drops the
+-- index it generated for fk_calculation_employee on its own
+ALTER TABLE calculation_results
+    ADD UNIQUE KEY uq_calculation_results_employee_period (employee_id, period_month);
+
+-- Period DELETE / period listing, and per-employee lookups within a period
+CREATE INDEX idx_calculation_results_period
+    ON calculation_results (period_month, employee_id);
@@ -0,0 +1,65 @@
+# RANGE partitioning of sales_records by sale month. Optional: applied only
+# with `python migrate.py --optional`.
+#
+# MySQL requires every unique key (the primary key included) to contain the
+# partitioning column and does not allow foreign keys on partitioned tables,
+# so the primary key becomes (id, sale_date) and fk_sales_records_employee is
+# dropped (salespeople are never deleted by the application). Partitions run
+# from the oldest sale month to PARTITION_MONTHS_AHEAD months past today,
+# with a MAXVALUE catch-all so inserts beyond that never fail.
+from datetime import date
+
+OPTIONAL = True
+PARTITION_MONTHS_AHEAD = 24
+
+
+def _month_starts(first, last):
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        yield date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def upgrade(conn):
+    db = conn.cursor()
+
+    # sale_date becomes NOT NULL below; under strict mode a NULL would abort
+    # the ALTER after the foreign key is already gone, so check up front
+    db.execute("SELECT COUNT(*) AS n FROM sales_records WHERE sale_date IS NULL")
+    missing = db.fetchone()["n"]
+    if missing:
+        raise RuntimeError(
+            f"sales_records has {missing} row(s) without a sale_date; partitioning "
+            "needs one on every row. Fix or delete them "
+            "(SELECT * FROM sales_records WHERE sale_date IS NULL) and run "
+            "`python migrate.py --optional` again."
+        )
+
+    db.execute("SELECT MIN(sale_date) AS first_sale FROM sales_records")
+    today = date.today()
+    first = db.fetchone()["first_sale"] or today
+    ahead = today.month - 1 + PARTITION_MONTHS_AHEAD
+    last = date(today.year + ahead // 12, ahead % 12 + 1, 1)
+
+    partitions = []
+    for start in _month_starts(first, last):
+        following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        partitions.append(
+            f"PARTITION p{start:%Y%m} VALUES LESS THAN ('{following:%Y-%m-%d}')"
+        )
+    partitions.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+
+    db.execute("ALTER TABLE sales_records DROP FOREIGN KEY fk_sales_records_employee")
+    db.execute(
+        """
+        ALTER TABLE sales_records
+            MODIFY sale_date DATE NOT NULL,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, sale_date)
+        """
+    )
+    db.execute(
+        "ALTER TABLE sales_records PARTITION BY RANGE COLUMNS (sale_date) (\n    "
+        + ",\n    ".join(partitions)
+        + "\n)"
+    )
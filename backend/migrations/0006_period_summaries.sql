@@ -0,0 +1,27 @@
+-- Dashboard stats per period, written by the calculator in the same
+-- transaction as the period's calculation_results.
+
+CREATE TABLE period_summaries (
+    period_month VARCHAR(20) PRIMARY KEY,
+    total_incentive DOUBLE NOT NULL DEFAULT 0,
+    total_salespeople INT NOT NULL DEFAULT 0,
+    avg_incentive DOUBLE NOT NULL DEFAULT 0,
+    top_performer VARCHAR(50),
+    median_incentive DOUBLE,
+    p90_incentive DOUBLE,
+    p99_incentive DOUBLE,
+    computed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- group_type is 'branch' or 'role'; a NULL branch/role is stored as ''
+CREATE TABLE period_group_summaries (
+    period_month VARCHAR(20),
+    group_type VARCHAR(10),
+    group_value VARCHAR(100) NOT NULL DEFAULT '',
+    total_incentive DOUBLE NOT NULL DEFAULT 0,
+    total_salespeople INT NOT NULL DEFAULT 0,
+    avg_incentive DOUBLE NOT NULL DEFAULT 0,
+    top_performer VARCHAR(50),
+
+    PRIMARY KEY (period_month, group_type, group_value)
+);
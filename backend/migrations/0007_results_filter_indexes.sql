@@ -0,0 +1,8 @@
+-- GETresults branch/role filters join salespeople; these let the join
+-- start from the matching salespeople instead of every result row.
+CREATE INDEX idx_salespeople_branch_role ON salespeople (branch, role);
+CREATE INDEX idx_salespeople_role ON salespeople (role);
+
+-- Amount-range filters within a period
+CREATE INDEX idx_calculation_results_period_amount
+    ON calculation_results (period_month, total_incentive);
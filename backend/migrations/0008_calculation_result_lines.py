@@ -0,0 +1,70 @@
+# One row per applied rule of a result (the normalized form of
+# calculation_results.breakdown_json), backfilled from the stored JSON.
+# `rank` is reserved in MySQL 8, hence rank_position.
+import json
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade(conn):
+    db = conn.cursor()
+    db.execute(
+        """
+        CREATE TABLE calculation_result_lines (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            period_month VARCHAR(20) NOT NULL,
+            employee_id VARCHAR(50) NOT NULL,
+            line_no SMALLINT NOT NULL,
+            line_type VARCHAR(40) NOT NULL,
+            rule_id VARCHAR(50),
+            vehicle_type VARCHAR(50),
+            rank_position SMALLINT UNSIGNED,
+            amount DOUBLE NOT NULL DEFAULT 0,
+
+            UNIQUE KEY uq_result_lines_employee (period_month, employee_id, line_no),
+            INDEX idx_result_lines_type (period_month, line_type, employee_id, amount),
+            INDEX idx_result_lines_rule (period_month, rule_id, amount)
+        )
+        """
+    )
+
+    last_id = 0
+    while True:
+        db.execute(
+            """
+            SELECT id, employee_id, period_month, breakdown_json
+            FROM calculation_results
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+            """,
+            (last_id, BACKFILL_BATCH)
+        )
+        results = db.fetchall()
+        if not results:
+            break
+        last_id = results[-1]["id"]
+
+        lines = []
+        for r in results:
+            try:
+                applied_rules = json.loads(r["breakdown_json"] or "[]")
+            except ValueError:
+                continue
+            for line_no, line in enumerate(applied_rules):
+                lines.append((
+                    r["period_month"], r["employee_id"], line_no, line.get("type"),
+                    line.get("rule_id"), line.get("vehicle_type"), line.get("rank"),
+                    line.get("amount", 0)
+                ))
+        if lines:
+            db.executemany(
+                """
+                INSERT INTO calculation_result_lines
+                (period_month, employee_id, line_no, line_type, rule_id,
+                 vehicle_type, rank_position, amount)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                lines
+            )
+        conn.commit()
@@ -0,0 +1,45 @@
+-- Versioned rule sets. Every rule upload (slab or bonus) publishes a new
+-- version; calculations compile the current version into a rule plan once
+-- per process and reuse it until the version moves.
+
+CREATE TABLE rule_sets (
+    version INT AUTO_INCREMENT PRIMARY KEY,
+    source VARCHAR(50) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Bonus stages outside the slab rules. threshold / amount per rule_type:
+--   Branch Milestone  branch units        -> amount per employee
+--   Consistency       distinct sale days  -> amount
+--   Cross Sell        vehicle types sold  -> amount
+--   Branch Rank       rank (1 = best)     -> amount
+--   Top Percent       share of employees  -> uplift ratio of the total
+-- Each version holds its complete set of rows.
+CREATE TABLE bonus_rules (
+    rule_set_version INT NOT NULL,
+    rule_type VARCHAR(30) NOT NULL,
+    threshold DOUBLE NOT NULL,
+    amount DOUBLE NOT NULL,
+
+    PRIMARY KEY (rule_set_version, rule_type, threshold),
+    FOREIGN KEY (rule_set_version) REFERENCES rule_sets(version)
+);
+
+-- Slab rules are append-only (uploads skip existing ids); a version sees
+-- the rules added at or before it
+ALTER TABLE incentive_rules
+    ADD COLUMN rule_set_version INT NOT NULL DEFAULT 1;
+
+-- Version 1: the values the engine used to hard-code
+INSERT INTO rule_sets (version, source) VALUES (1, 'baseline');
+
+INSERT INTO bonus_rules (rule_set_version, rule_type, threshold, amount) VALUES
+    (1, 'Branch Milestone', 400, 10000),
+    (1, 'Branch Milestone', 300, 6000),
+    (1, 'Branch Milestone', 200, 3000),
+    (1, 'Consistency', 20, 4000),
+    (1, 'Cross Sell', 3, 3000),
+    (1, 'Branch Rank', 1, 15000),
+    (1, 'Branch Rank', 2, 10000),
+    (1, 'Branch Rank', 3, 5000),
+    (1, 'Top Percent', 0.1, 0.5);
@@ -0,0 +1,43 @@
+-- Idempotent sales ingestion.
+--
+-- ingested_files: SHA-256 of every fully ingested upload; the same file
+-- sent again is answered from here without being parsed.
+--
+-- sales_records.row_hash: first 16 bytes of SHA-256 over the row's natural
+-- key and its occurrence number (0 for the first copy of that key in a
+-- file, 1 for the second, ...), joined by the unit separator:
+--   employee_id, vehicle_model, quantity, sale_date, vehicle_type, occurrence
+-- Uploads insert with ON DUPLICATE KEY UPDATE id = id, so rows already
+-- stored are skipped by the unique index. The index includes sale_date
+-- so it stays valid on the partitioned table (0005).
+
+CREATE TABLE ingested_files (
+    sha256 CHAR(64) PRIMARY KEY,
+    filename VARCHAR(255),
+    rows_new INT NOT NULL DEFAULT 0,
+    rows_duplicate INT NOT NULL DEFAULT 0,
+    rows_failed INT NOT NULL DEFAULT 0,
+    ingested_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE sales_records
+    ADD COLUMN row_hash BINARY(16) NULL;
+
+-- Existing rows: occurrences are numbered over the whole history, so
+-- re-sending any file that was loaded before is recognised
+UPDATE sales_records s
+JOIN (
+    SELECT id,
+           ROW_NUMBER() OVER (
+               PARTITION BY employee_id, vehicle_model, quantity, sale_date, vehicle_type
+               ORDER BY id
+           ) - 1 AS occurrence
+    FROM sales_records
+) o ON o.id = s.id
+SET s.row_hash = UNHEX(LEFT(SHA2(CONCAT_WS(
+    CHAR(31 USING utf8mb4),
+    s.employee_id, s.vehicle_model, s.quantity, s.sale_date, s.vehicle_type, o.occurrence
+), 256), 32));
+
+CREATE UNIQUE INDEX uq_sales_records_row_hash
+    ON sales_records (row_hash, sale_date);
@@ -0,0 +1,14 @@
+-- Top-10% membership of each result as its own column, so incremental
+-- runs look up the stored members of a tied cutoff by flag instead of
+-- matching the bonus label inside breakdown_json.
+
+ALTER TABLE calculation_results
+    ADD COLUMN is_top_performer TINYINT(1) NOT NULL DEFAULT 0;
+
+-- Existing results: members are the ones with a top-10% breakdown line
+UPDATE calculation_results r
+JOIN calculation_result_lines l
+    ON l.period_month = r.period_month
+    AND l.employee_id = r.employee_id
+    AND l.line_type = 'Top 10 Percent Bonus'
+SET r.is_top_performer = 1;
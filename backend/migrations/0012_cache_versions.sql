@@ -0,0 +1,10 @@
+-- Per-period version of what the response cache serves. Calculation and
+-- ingestion bump a period's row in the same transaction as its data; each
+-- worker re-reads the table and drops cached responses of the periods
+-- whose version moved, so an invalidation reaches every worker.
+
+CREATE TABLE cache_versions (
+    period_month VARCHAR(20) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date
-from typing import Optional
+from typing import List, Literal, Optional
 
 class SalesRowSchema(BaseModel):
     Employee_ID: str = Field(..., min_length=1)
@@ -24,6 +24,14 @@ class RuleRowSchema(BaseModel):
 
 class IncentiveCalculationRequest(BaseModel):
     period: str = Field(example="2025-09")
+    background: bool = False
+    sharded: bool = False
+    incremental: bool = False
+
+class IncentiveRecalculationRequest(BaseModel):
+    start_period: str = Field(example="2024-10")
+    end_period: str = Field(example="2025-09")
+    workers: Optional[int] = Field(default=None, gt=0)
 
 class CalculationResultSchema(BaseModel):
     employee_id: str
@@ -36,8 +44,72 @@ class CalculationResultSchema(BaseModel):
         from_attributes = True
 
 
+class GroupStatsSchema(BaseModel):
+    group: Optional[str]
+    total_incentive: float
+    total_salespeople: int
+    avg_incentive: float
+    top_performer: Optional[str]
+
+
 class CalculationStatsSchema(BaseModel):
     total_incentive: float
     total_salespeople: int
     avg_incentive: float
-    top_performer: Optional[str]
\ No newline at end of file
+    top_performer: Optional[str]
+    period: Optional[str] = None
+    median_incentive: Optional[float] = None
+    p90_incentive: Optional[float] = None
+    p99_incentive: Optional[float] = None
+    by_branch: Optional[List[GroupStatsSchema]] = None
+    by_role: Optional[List[GroupStatsSchema]] = None
+
+
+class BreakdownTotalSchema(BaseModel):
+    group: Optional[str]
+    line_type: str
+    total_amount: float
+    lines: int
+    employees: int
+
+
+class RuleUsageSchema(BaseModel):
+    rule_id: str
+    vehicle_type: Optional[str]
+    times_triggered: int
+    employees: int
+    total_amount: float
+
+
+class BonusParamsSchema(BaseModel):
+    # Overrides of the current rule set's bonus parameters; omitted fields
+    # keep the published values
+    branch_milestones: Optional[List[List[float]]] = Field(
+        default=None, example=[[400, 10000], [300, 6000], [200, 3000]]
+    )
+    consistency_days: Optional[int] = Field(default=None, ge=0)
+    consistency_bonus: Optional[float] = Field(default=None, ge=0)
+    cross_sell_types: Optional[int] = Field(default=None, ge=0)
+    cross_sell_bonus: Optional[float] = Field(default=None, ge=0)
+    rank_bonus: Optional[List[float]] = Field(default=None, example=[15000, 10000, 5000])
+    top_percent: Optional[float] = Field(default=None, gt=0, le=1)
+    top_uplift: Optional[float] = Field(default=None, ge=0)
+
+
+class SimulationScenarioSchema(BaseModel):
+    name: str = Field(..., min_length=1)
+    # Replaces the period's slab rules when given
+    rules: Optional[List[RuleRowSchema]] = None
+    params: BonusParamsSchema = BonusParamsSchema()
+
+
+class SimulationRequest(BaseModel):
+    period: str = Field(example="2025-09")
+    scenarios: List[SimulationScenarioSchema] = Field(..., min_length=1)
+    workers: Optional[int] = Field(default=None, gt=0)
+
+
+class BonusRuleRowSchema(BaseModel):
+    Rule_Type: Literal["Branch Milestone", "Consistency", "Cross Sell", "Branch Rank", "Top Percent"]
+    Threshold: float = Field(..., ge=0)
+    Amount: float = Field(..., ge=0)
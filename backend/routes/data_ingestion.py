@@ -1,133 +1,187 @@
-import shutil
 from pydantic import ValidationError
-from fastapi import APIRouter, UploadFile, File, Form,HTTPException
+from fastapi import APIRouter, UploadFile, File, Form,HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 import os
-import pandas as pd
 from dotenv import load_dotenv
-from models import SalesRowSchema,RuleRowSchema
-from database import db,conn
+from models import SalesRowSchema, RuleRowSchema, BonusRuleRowSchema
+from async_database import get_async_db
+from services.rule_plan import publish_rule_set, reload_rule_plans, check_bonus_rules
+from services.sales_ingestion import (
+    validate_sales_frame, write_sales_frame, file_sha256, row_hashes, RowOccurrences
+)
+from services.readers import iter_upload_frames, read_upload, schema_columns, row_values
+from services.cache import results_cache
+from services.metrics import StageTimer
 
 load_dotenv()
 data_ingestion_router = APIRouter()
 
-##########################DIRECTORY TO SAVE UPLOADED FILES ##########################
-UPLOAD_DIRECTORY = "uploads"
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
-############################ API ROUTES FOR DATA INGESTION #########################
-@data_ingestion_router.post("/upload_sales_data")
-async def upload_sales_data(file: UploadFile = File(...)):
-    try:
-        file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+########################## STREAMING INGESTION SETTINGS ##########################
+# Uploads are parsed straight from the request's spooled file, this many
+# rows at a time; every chunk is validated and committed before the next
+# one is read, so memory stays bounded by the chunk size. CSV, Parquet and
+# XLSX uploads are accepted (by file extension, see services/readers.py).
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", 10000))
 
-        df = pd.read_csv(file_path)
+REQUIRED_SALES_COLUMNS = schema_columns(SalesRowSchema)
+REQUIRED_RULE_COLUMNS = schema_columns(RuleRowSchema)
+REQUIRED_BONUS_RULE_COLUMNS = schema_columns(BonusRuleRowSchema)
 
-        REQUIRED_SALES_COLUMNS = ["Employee_ID", "Branch", "Role", "Vehicle_Model", "Quantity", "Sale_Date", "Vehicle_Type"]
+############################ BLOCKING HELPERS (run in threadpool) #########################
+def validate_rows(df, schema):
+    valid_rows = []
+    failed_rows = []
 
-        missing_cols = [col for col in REQUIRED_SALES_COLUMNS if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing columns: {missing_cols}"
+    for index, row in df.iterrows():
+        try:
+            # 🔹 Convert upload row to dict + Pydantic validation
+            valid_rows.append((index, schema(**row_values(row))))
+
+        except ValidationError as ve:
+            failed_rows.append({
+                "row": index + 1,
+                "error": ve.errors()
+            })
+
+    return valid_rows, failed_rows
+
+############################ API ROUTES FOR DATA INGESTION #########################
+@data_ingestion_router.post("/upload_sales_data")
+async def upload_sales_data(file: UploadFile = File(...), conn=Depends(get_async_db)):
+    reader = None
+    stages = StageTimer("ingestion", filename=file.filename)
+    try:
+        # -----------------------------
+        # 0. Fingerprint: a file seen before is not parsed again
+        # -----------------------------
+        stages.mark("fingerprint")
+        sha256 = await run_in_threadpool(file_sha256, file.file)
+        async with conn.cursor() as db:
+            await db.execute(
+                "SELECT rows_new, rows_duplicate, rows_failed, ingested_at FROM ingested_files WHERE sha256 = %s",
+                (sha256,)
             )
+            seen = await db.fetchone()
+        if seen:
+            stages.finish("duplicate_file")
+            return {
+                "status": "duplicate_file",
+                "file_sha256": sha256,
+                "ingested_at": str(seen["ingested_at"]),
+                "processed": 0,
+                "new_rows": 0,
+                "duplicate_rows": seen["rows_new"] + seen["rows_duplicate"],
+                "failed": seen["rows_failed"],
+                "failed_rows": [],
+                "chunks": []
+            }
+
+        reader = iter_upload_frames(file.file, file.filename, REQUIRED_SALES_COLUMNS, INGEST_CHUNK_SIZE)
 
         success_count = 0
+        duplicate_count = 0
         failed_rows = []
+        chunks = []
+        occurrences = RowOccurrences()
 
-        for index, row in df.iterrows():
-            try:
-                # 🔹 Convert CSV row to dict
-                row_dict = row.to_dict()
-
-                # 🔹 Pydantic validation
-                sales_data = SalesRowSchema(**row_dict)
-
-                # Insert salesperson
-                db.execute(
-                    "SELECT id FROM salespeople WHERE id = %s",
-                    (sales_data.Employee_ID,)
-                )
-                if not db.fetchone():
-                    db.execute(
-                        """
-                        INSERT INTO salespeople (id, branch, role)
-                        VALUES (%s, %s, %s)
-                        """,
-                        (
-                            sales_data.Employee_ID,
-                            sales_data.Branch,
-                            sales_data.Role
-                        )
-                    )
+        async with conn.cursor() as db:
+            while True:
+                # -----------------------------
+                # 1. Parse next chunk
+                # -----------------------------
+                stages.mark("read")
+                df = await run_in_threadpool(next, reader, None)
+                if df is None:
+                    break
 
-                # Insert sales record
-                db.execute(
-                    """
-                    INSERT INTO sales_records
-                    (employee_id, vehicle_model, quantity, sale_date, vehicle_type)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (
-                        sales_data.Employee_ID,
-                        sales_data.Vehicle_Model,
-                        sales_data.Quantity,
-                        sales_data.Sale_Date,
-                        sales_data.Vehicle_Type
+                missing_cols = [col for col in REQUIRED_SALES_COLUMNS if col not in df.columns]
+                if missing_cols:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Missing columns: {missing_cols}"
                     )
-                )
 
-                success_count += 1
+                # -----------------------------
+                # 2. Validate chunk
+                # -----------------------------
+                stages.mark("validate")
+                stages.count("rows_read", len(df))
+                frame, chunk_failed = await run_in_threadpool(validate_sales_frame, df)
+                stages.mark("hash")
+                hashes = await run_in_threadpool(row_hashes, frame, occurrences)
 
-            except ValidationError as ve:
-                failed_rows.append({
-                    "row": index + 1,
-                    "error": ve.errors()
+                # -----------------------------
+                # 3. Bulk write (duplicates skipped) + commit chunk
+                # -----------------------------
+                stages.mark("write")
+                chunk_processed, chunk_duplicates = await write_sales_frame(db, frame, hashes)
+                stages.mark("commit")
+                await conn.commit()
+                if chunk_processed:
+                    results_cache.invalidate_periods(
+                        f"{d.year:04d}-{d.month:02d}" for d in frame["sale_date"].tolist()
+                    )
+
+                success_count += chunk_processed
+                duplicate_count += chunk_duplicates
+                failed_rows.extend(chunk_failed)
+                stages.count("rows_written", chunk_processed)
+                stages.count("rows_duplicate", chunk_duplicates)
+                stages.count("rows_failed", len(chunk_failed))
+                chunks.append({
+                    "chunk": len(chunks) + 1,
+                    "rows": len(df),
+                    "processed": chunk_processed,
+                    "duplicates": chunk_duplicates,
+                    "failed": len(chunk_failed),
+                    "total_processed": success_count
                 })
-                continue
 
-        conn.commit()
+            # -----------------------------
+            # 4. Remember the file once fully ingested
+            # -----------------------------
+            await db.execute(
+                """
+                INSERT INTO ingested_files
+                (sha256, filename, rows_new, rows_duplicate, rows_failed)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE sha256 = sha256
+                """,
+                (sha256, file.filename, success_count, duplicate_count, len(failed_rows))
+            )
+            await conn.commit()
 
+        stages.finish()
         return {
             "status": "success",
+            "file_sha256": sha256,
             "processed": success_count,
+            "new_rows": success_count,
+            "duplicate_rows": duplicate_count,
             "failed": len(failed_rows),
-            "failed_rows": failed_rows
+            "failed_rows": failed_rows,
+            "chunks": chunks
         }
 
     except Exception as e:
+        stages.finish("failed")
         raise HTTPException(status_code=400, detail=str(e))
 
+    finally:
+        if reader is not None:
+            reader.close()
+
 @data_ingestion_router.post("/upload_structured_rule")
-async def upload_structured_rule(file: UploadFile = File(...)):
+async def upload_structured_rule(file: UploadFile = File(...), conn=Depends(get_async_db)):
     try:
         # -----------------------------
-        # 1. Save uploaded file
-        # -----------------------------
-        file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        # -----------------------------
-        # 2. Read CSV
+        # 1. Read upload (rule sheets are small)
         # -----------------------------
-        df = pd.read_csv(file_path)
+        df = await run_in_threadpool(read_upload, file.file, file.filename, REQUIRED_RULE_COLUMNS)
 
         # -----------------------------
-        # 3. Validate required columns
+        # 2. Validate required columns
         # -----------------------------
-        REQUIRED_RULE_COLUMNS = [
-            "Rule_ID",
-            "Role",
-            "Vehicle_Type",
-            "Min_Units",
-            "Max_Units",
-            "Incentive_Amount_INR",
-            "Bonus_Per_Unit_INR",
-            "Valid_From",
-            "Valid_To"
-        ]
-
         missing_cols = [col for col in REQUIRED_RULE_COLUMNS if col not in df.columns]
         if missing_cols:
             raise HTTPException(
@@ -136,85 +190,140 @@ async def upload_structured_rule(file: UploadFile = File(...)):
             )
 
         success_count = 0
-        failed_rows = []
 
         # -----------------------------
-        # 4. Process rows
+        # 3. Validate rows (off the event loop)
+        # -----------------------------
+        valid_rows, failed_rows = await run_in_threadpool(validate_rows, df, RuleRowSchema)
+
+        # -----------------------------
+        # 4. Insert rules (under a new rule-set version)
         # -----------------------------
-        for index, row in df.iterrows():
-            try:
-                row_dict = row.to_dict()
-
-                # Pydantic validation
-                rule_data = RuleRowSchema(**row_dict)
-
-                # Check if rule already exists
-                db.execute(
-                    "SELECT id FROM incentive_rules WHERE id = %s",
-                    (rule_data.Rule_ID,)
-                )
-                if db.fetchone():
-                    continue  # Skip existing rule
-
-                # Insert rule
-                db.execute(
-                    """
-                    INSERT INTO incentive_rules
-                    (
-                        id,
-                        role,
-                        vehicle_type,
-                        min_units,
-                        max_units,
-                        incentive_amount,
-                        bonus_per_unit,
-                        valid_from,
-                        valid_to,
-                        rule_type
+        version = None
+        async with conn.cursor() as db:
+            for index, rule_data in valid_rows:
+                try:
+                    # Check if rule already exists
+                    await db.execute(
+                        "SELECT id FROM incentive_rules WHERE id = %s",
+                        (rule_data.Rule_ID,)
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        rule_data.Rule_ID,
-                        rule_data.Role,
-                        rule_data.Vehicle_Type,
-                        rule_data.Min_Units,
-                        rule_data.Max_Units,
-                        rule_data.Incentive_Amount_INR,
-                        rule_data.Bonus_Per_Unit_INR,
-                        rule_data.Valid_From,
-                        rule_data.Valid_To,
-                        "Structured"
+                    if await db.fetchone():
+                        continue  # Skip existing rule
+
+                    if version is None:
+                        version = await publish_rule_set(db, "structured_rules")
+
+                    # Insert rule
+                    await db.execute(
+                        """
+                        INSERT INTO incentive_rules
+                        (
+                            id,
+                            role,
+                            vehicle_type,
+                            min_units,
+                            max_units,
+                            incentive_amount,
+                            bonus_per_unit,
+                            valid_from,
+                            valid_to,
+                            rule_type,
+                            rule_set_version
+                        )
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        (
+                            rule_data.Rule_ID,
+                            rule_data.Role,
+                            rule_data.Vehicle_Type,
+                            rule_data.Min_Units,
+                            rule_data.Max_Units,
+                            rule_data.Incentive_Amount_INR,
+                            rule_data.Bonus_Per_Unit_INR,
+                            rule_data.Valid_From,
+                            rule_data.Valid_To,
+                            "Structured",
+                            version
+                        )
                     )
-                )
 
-                success_count += 1
+                    success_count += 1
 
-            except ValidationError as ve:
-                failed_rows.append({
-                    "row": index + 1,
-                    "error": ve.errors()
-                })
-                continue
+                except Exception as e:
+                    failed_rows.append({
+                        "row": index + 1,
+                        "error": str(e)
+                    })
+                    continue
 
-            except Exception as e:
-                failed_rows.append({
-                    "row": index + 1,
-                    "error": str(e)
-                })
-                continue
+            # Slab amounts changed: stored runs can't be reused incrementally
+            if success_count:
+                await db.execute("DELETE FROM calculation_runs")
+
+        failed_rows.sort(key=lambda r: r["row"])
 
         # -----------------------------
         # 5. Commit DB
         # -----------------------------
-        conn.commit()
+        await conn.commit()
+        # Other processes see the new version on their next calculation
+        reload_rule_plans()
 
         return {
             "status": "success",
+            "rule_set_version": version,
             "processed": success_count,
             "failed": len(failed_rows),
             "failed_rows": failed_rows
         }
 
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@data_ingestion_router.post("/upload_bonus_rules")
+async def upload_bonus_rules(file: UploadFile = File(...), conn=Depends(get_async_db)):
+    # Publishes a new rule-set version. Every rule type present in the file
+    # is replaced as a whole; the other types carry over unchanged.
+    try:
+        df = await run_in_threadpool(read_upload, file.file, file.filename, REQUIRED_BONUS_RULE_COLUMNS)
+
+        missing_cols = [col for col in REQUIRED_BONUS_RULE_COLUMNS if col not in df.columns]
+        if missing_cols:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing columns: {missing_cols}"
+            )
+
+        valid_rows, failed_rows = await run_in_threadpool(validate_rows, df, BonusRuleRowSchema)
+        # A partial bonus table would silently change payouts: all or nothing
+        if failed_rows or not valid_rows:
+            return {
+                "status": "failed",
+                "processed": 0,
+                "failed": len(failed_rows),
+                "failed_rows": failed_rows
+            }
+
+        rules = [(r.Rule_Type, r.Threshold, r.Amount) for _, r in valid_rows]
+        check_bonus_rules(rules)
+
+        async with conn.cursor() as db:
+            version = await publish_rule_set(db, "bonus_rules", rules)
+            # Bonus amounts changed: stored runs can't be reused incrementally
+            await db.execute("DELETE FROM calculation_runs")
+
+        await conn.commit()
+        reload_rule_plans()
+
+        return {
+            "status": "success",
+            "rule_set_version": version,
+            "processed": len(rules),
+            "failed": 0,
+            "failed_rows": []
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
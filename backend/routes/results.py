@@ -1,69 +1,425 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from database import db, conn
-from models import CalculationResultSchema,CalculationStatsSchema
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import aiomysql
+from pydantic import TypeAdapter
+from async_database import async_connection
+from models import (
+    CalculationResultSchema, CalculationStatsSchema, BreakdownTotalSchema, RuleUsageSchema
+)
 from dotenv import load_dotenv
+from services.exports import (
+    ENCODERS, EXPORT_FORMATS, EXPORT_FETCH_SIZE, check_export_format, gzip_stream
+)
+from services.cache import results_cache, CachedResponse, CACHE_VERSIONS_QUERY
+import base64
+import json
 
 load_dotenv()
 
 results_router = APIRouter()
 
+RESULT_LIST = TypeAdapter(List[CalculationResultSchema])
+SALESPEOPLE_LIST = TypeAdapter(List[str])
+STATS = TypeAdapter(CalculationStatsSchema)
+BREAKDOWN_TOTALS = TypeAdapter(List[BreakdownTotalSchema])
+RULE_USAGE = TypeAdapter(List[RuleUsageSchema])
+
+BREAKDOWN_GROUPS = {"branch": "p.branch", "role": "p.role", "none": "NULL"}
+
+
+############################ RESPONSE CACHE #########################
+# Cached routes serialize through their response model themselves and only
+# open a connection on a miss (or to read cache_versions, at most every
+# RESULTS_CACHE_VERSION_INTERVAL). Entries are tagged with the period they
+# cover; calculation and ingestion commits in any worker drop them.
+async def _sync_cache_versions():
+    try:
+        async with async_connection() as conn, conn.cursor() as db:
+            await db.execute(CACHE_VERSIONS_QUERY)
+            rows = await db.fetchall()
+    except Exception:
+        results_cache.versions_failed()
+        return
+    results_cache.apply_versions({r["period_month"]: r["version"] for r in rows})
+
+
+async def _cache_lookup(request):
+    if results_cache.versions_due():
+        await _sync_cache_versions()
+    request.state.cache_generation = results_cache.generation
+    key = results_cache.key(request.url.path, dict(request.query_params))
+    return key, results_cache.get(key)
+
+
+def _cached_response(request, cached):
+    if cached.matches(request.headers.get("if-none-match")):
+        results_cache.count_not_modified()
+        return Response(status_code=304, headers={"ETag": cached.etag})
+    return Response(
+        cached.body,
+        media_type=cached.media_type,
+        headers={**cached.headers, "ETag": cached.etag}
+    )
+
+
+def _cache_store(request, key, period, body, headers=None):
+    cached = CachedResponse(body, headers=headers)
+    results_cache.set(key, cached, period, request.state.cache_generation)
+    return _cached_response(request, cached)
+
+
+############################ RESULT PAGE CURSORS #########################
+def encode_cursor(row):
+    token = json.dumps([row["period_month"], row["employee_id"]])
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        period_month, employee_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(period_month), str(employee_id)
+
+
+def _result_filters(period, branch, role, employee_id, min_incentive, max_incentive):
+    join, conditions, args = "", [], []
+    if branch is not None or role is not None:
+        join = "JOIN salespeople p ON p.id = r.employee_id"
+    if period is not None:
+        conditions.append("r.period_month = %s")
+        args.append(period)
+    if branch is not None:
+        conditions.append("p.branch = %s")
+        args.append(branch)
+    if role is not None:
+        conditions.append("p.role = %s")
+        args.append(role)
+    if employee_id is not None:
+        conditions.append("r.employee_id = %s")
+        args.append(employee_id)
+    if min_incentive is not None:
+        conditions.append("r.total_incentive >= %s")
+        args.append(min_incentive)
+    if max_incentive is not None:
+        conditions.append("r.total_incentive <= %s")
+        args.append(max_incentive)
+    return join, conditions, args
+
+
 ############################ API ROUTES FOR RESULTS #########################
 @results_router.get("/GETresults", response_model=List[CalculationResultSchema])
-def GETresults(skip: int = 0, limit: int = 100):
+async def GETresults(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    period: Optional[str] = None,
+    branch: Optional[str] = None,
+    role: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    min_incentive: Optional[float] = None,
+    max_incentive: Optional[float] = None,
+    include_total: bool = False
+):
+    # Pages are ordered by (period_month, employee_id). Pass the
+    # X-Next-Cursor header of a page as ?cursor= to get the next one; skip
+    # still works for old clients but cost grows with depth.
+    key, cached = await _cache_lookup(request)
+    if cached is not None:
+        return _cached_response(request, cached)
+
     try:
-        query = """
-       SELECT employee_id, period_month, total_incentive,
-                   breakdown_json, status
-        FROM calculation_results
+        headers = {}
+        join, conditions, args = _result_filters(
+            period, branch, role, employee_id, min_incentive, max_incentive
+        )
+        filter_conditions, filter_args = list(conditions), list(args)
+
+        offset = skip
+        if cursor:
+            after_period, after_employee = decode_cursor(cursor)
+            conditions.append(
+                "(r.period_month > %s OR (r.period_month = %s AND r.employee_id > %s))"
+            )
+            args.extend([after_period, after_period, after_employee])
+            offset = 0
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+        SELECT r.employee_id, r.period_month, r.total_incentive,
+               r.breakdown_json, r.status
+        FROM calculation_results r
+        {join}
+        {where}
+        ORDER BY r.period_month, r.employee_id
         LIMIT %s OFFSET %s
         """
-        db.execute(query, (limit, skip))
-        results = db.fetchall()
-        return results
+        async with async_connection() as conn, conn.cursor() as db:
+            # One extra row tells whether there is a next page
+            await db.execute(query, (*args, limit + 1, offset))
+            results = list(await db.fetchall())
+
+            if include_total:
+                where = f"WHERE {' AND '.join(filter_conditions)}" if filter_conditions else ""
+                await db.execute(
+                    f"SELECT COUNT(*) AS total FROM calculation_results r {join} {where}",
+                    filter_args
+                )
+                headers["X-Total-Count"] = str((await db.fetchone())["total"])
+
+        if len(results) > limit:
+            results = results[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(results[-1])
+
+        return _cache_store(request, key, period, RESULT_LIST.dump_json(RESULT_LIST.validate_python(results)), headers)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
+############################ STREAMING EXPORT #########################
+async def _period_result_batches(period):
+    # Unbuffered (server-side) cursor on its own pooled connection: the
+    # stream outlives the request handler, so it cannot borrow the
+    # request's dependency connection
+    async with async_connection() as conn, conn.cursor(aiomysql.SSDictCursor) as db:
+        await db.execute(
+            """
+            SELECT employee_id, period_month, total_incentive,
+                   breakdown_json, status
+            FROM calculation_results
+            WHERE period_month=%s
+            ORDER BY employee_id
+            """,
+            (period,)
+        )
+        while True:
+            rows = await db.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+
+
+@results_router.get("/export")
+async def export_results(period: str, format: str = "csv", gzip: bool = False):
+    try:
+        check_export_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"incentives_{period}.{extension}"
+    chunks = ENCODERS[format](_period_result_batches(period))
+    if gzip:
+        chunks = gzip_stream(chunks)
+        media_type, filename = "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @results_router.get("/GETsalespeople", response_model=List[str])
-def GETsalespeople():
+async def GETsalespeople(request: Request):
+    key, cached = await _cache_lookup(request)
+    if cached is not None:
+        return _cached_response(request, cached)
+
     try:
         query = "SELECT id FROM salespeople"
-        db.execute(query)
-        salespeople = [row["id"] for row in db.fetchall()]
-        return salespeople
+        async with async_connection() as conn, conn.cursor() as db:
+            await db.execute(query)
+            salespeople = [row["id"] for row in await db.fetchall()]
+        return _cache_store(request, key, None, SALESPEOPLE_LIST.dump_json(SALESPEOPLE_LIST.validate_python(salespeople)))
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
+async def _aggregate_stats(db, period=None):
+    # Totals straight from calculation_results, aggregated in SQL; ties for
+    # top performer go to the earliest row, as the old Python max() did
+    where, args = ("WHERE period_month=%s", (period,)) if period else ("", ())
+    await db.execute(
+        f"""
+        SELECT COALESCE(SUM(total_incentive), 0) AS total_incentive,
+               COUNT(*) AS total_salespeople,
+               COALESCE(AVG(total_incentive), 0) AS avg_incentive
+        FROM calculation_results
+        {where}
+        """,
+        args
+    )
+    stats = await db.fetchone()
+    await db.execute(
+        f"""
+        SELECT employee_id
+        FROM calculation_results
+        {where}
+        ORDER BY total_incentive DESC, id
+        LIMIT 1
+        """,
+        args
+    )
+    top = await db.fetchone()
+
+    return {
+        "total_incentive": float(stats["total_incentive"]),
+        "total_salespeople": stats["total_salespeople"],
+        "avg_incentive": float(stats["avg_incentive"]),
+        "top_performer": top["employee_id"] if top else None
+    }
+
+
+async def _period_stats(db, period):
+    # One period: the summary the calculator wrote at commit
+    await db.execute(
+        "SELECT * FROM period_summaries WHERE period_month=%s",
+        (period,)
+    )
+    summary = await db.fetchone()
+    if summary is None:
+        # Calculated before summaries existed (or not at all)
+        stats = await _aggregate_stats(db, period)
+        stats["period"] = period
+        return stats
+
+    await db.execute(
+        """
+        SELECT group_type, group_value, total_incentive,
+               total_salespeople, avg_incentive, top_performer
+        FROM period_group_summaries
+        WHERE period_month=%s
+        ORDER BY group_type, total_incentive DESC
+        """,
+        (period,)
+    )
+    breakdown = {"branch": [], "role": []}
+    for g in await db.fetchall():
+        breakdown[g["group_type"]].append({
+            "group": g["group_value"] or None,
+            "total_incentive": g["total_incentive"],
+            "total_salespeople": g["total_salespeople"],
+            "avg_incentive": g["avg_incentive"],
+            "top_performer": g["top_performer"]
+        })
+
+    return {
+        "period": period,
+        "total_incentive": summary["total_incentive"],
+        "total_salespeople": summary["total_salespeople"],
+        "avg_incentive": summary["avg_incentive"],
+        "top_performer": summary["top_performer"],
+        "median_incentive": summary["median_incentive"],
+        "p90_incentive": summary["p90_incentive"],
+        "p99_incentive": summary["p99_incentive"],
+        "by_branch": breakdown["branch"],
+        "by_role": breakdown["role"]
+    }
+
+
 @results_router.get("/GETdashboard_stats", response_model=CalculationStatsSchema)
-def GETdashboard_stats():
+async def GETdashboard_stats(request: Request, period: Optional[str] = None):
+    key, cached = await _cache_lookup(request)
+    if cached is not None:
+        return _cached_response(request, cached)
+
     try:
-        # Total Incentive
-        db.execute("""
-            SELECT employee_id, total_incentive
-            FROM calculation_results
-        """)
-        results = db.fetchall()
-
-        total_salespeople = len(results)
-        total_incentive = sum(r["total_incentive"] for r in results)
-        avg_incentive = (
-            total_incentive / total_salespeople
-            if total_salespeople > 0 else 0
+        async with async_connection() as conn, conn.cursor() as db:
+            if period is None:
+                # All periods: SQL aggregation over calculation_results
+                stats = await _aggregate_stats(db)
+            else:
+                stats = await _period_stats(db, period)
+        return _cache_store(request, key, period, STATS.dump_json(STATS.validate_python(stats)))
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+############################ BREAKDOWN ANALYSIS #########################
+@results_router.get("/GETbreakdown_totals", response_model=List[BreakdownTotalSchema])
+async def GETbreakdown_totals(
+    request: Request,
+    period: str,
+    group_by: str = "branch",
+    line_type: Optional[str] = None
+):
+    # Amount paid per incentive line type (Branch Rank Bonus, Structured
+    # Slab, ...) for a period, per branch or role of the employee
+    key, cached = await _cache_lookup(request)
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    try:
+        if group_by not in BREAKDOWN_GROUPS:
+            raise ValueError(f"group_by must be one of: {', '.join(BREAKDOWN_GROUPS)}")
+
+        join = "" if group_by == "none" else "LEFT JOIN salespeople p ON p.id = l.employee_id"
+        where, args = "WHERE l.period_month=%s", [period]
+        if line_type is not None:
+            where += " AND l.line_type=%s"
+            args.append(line_type)
+
+        async with async_connection() as conn, conn.cursor() as db:
+            await db.execute(
+                f"""
+                SELECT {BREAKDOWN_GROUPS[group_by]} AS `group`, l.line_type,
+                       SUM(l.amount) AS total_amount,
+                       COUNT(*) AS `lines`,
+                       COUNT(DISTINCT l.employee_id) AS employees
+                FROM calculation_result_lines l
+                {join}
+                {where}
+                GROUP BY `group`, l.line_type
+                ORDER BY total_amount DESC
+                """,
+                args
+            )
+            totals = await db.fetchall()
+        return _cache_store(
+            request, key, period, BREAKDOWN_TOTALS.dump_json(BREAKDOWN_TOTALS.validate_python(totals))
         )
 
-        top_performer = None
-        if results:
-            top = max(results, key=lambda x: x["total_incentive"])
-            top_performer = top["employee_id"]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-        return {
-            "total_incentive": total_incentive,
-            "total_salespeople": total_salespeople,
-            "avg_incentive": avg_incentive,
-            "top_performer": top_performer
-        }
+@results_router.get("/GETrule_usage", response_model=List[RuleUsageSchema])
+async def GETrule_usage(request: Request, period: str, limit: int = 20):
+    # Most-triggered slab rules of a period
+    key, cached = await _cache_lookup(request)
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    try:
+        async with async_connection() as conn, conn.cursor() as db:
+            await db.execute(
+                """
+                SELECT rule_id, vehicle_type,
+                       COUNT(*) AS times_triggered,
+                       COUNT(DISTINCT employee_id) AS employees,
+                       SUM(amount) AS total_amount
+                FROM calculation_result_lines
+                WHERE period_month=%s AND rule_id IS NOT NULL
+                GROUP BY rule_id, vehicle_type
+                ORDER BY times_triggered DESC, total_amount DESC
+                LIMIT %s
+                """,
+                (period, limit)
+            )
+            usage = await db.fetchall()
+        return _cache_store(
+            request, key, period, RULE_USAGE.dump_json(RULE_USAGE.validate_python(usage))
+        )
 
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@results_router.get("/GETcache_stats")
+async def GETcache_stats():
+    return results_cache.stats()
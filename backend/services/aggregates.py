@@ -0,0 +1,160 @@
+import argparse
+import time
+import pandas as pd
+from services.periods import period_bounds
+
+############################ MONTHLY SALES AGGREGATES #########################
+# sales_monthly_units holds unit sums per (period, employee, vehicle type)
+# and the lowest sales_records id behind each, so the calculator keeps the
+# raw scan's first-appearance order. sales_employee_days holds one row per
+# employee per day with a sale; a month's distinct-day count is a range count.
+
+FOLD_BATCH_UNITS = """
+    INSERT INTO sales_monthly_units
+    (period_month, employee_id, vehicle_type, units, first_record_id)
+    SELECT DATE_FORMAT(sale_date, '%%Y-%%m'), employee_id, vehicle_type,
+           SUM(quantity), MIN(id)
+    FROM sales_records
+    WHERE ingest_batch = %s
+    GROUP BY DATE_FORMAT(sale_date, '%%Y-%%m'), employee_id, vehicle_type
+    ON DUPLICATE KEY UPDATE
+        units = units + VALUES(units),
+        first_record_id = LEAST(first_record_id, VALUES(first_record_id))
+"""
+
+FOLD_BATCH_DAYS = """
+    INSERT IGNORE INTO sales_employee_days (sale_date, employee_id)
+    SELECT DISTINCT sale_date, employee_id
+    FROM sales_records
+    WHERE ingest_batch = %s
+"""
+
+
+def _branch_filter(branches, alias="p"):
+    # SQL condition + args matching salespeople in any of branches (None
+    # standing for NULL branch)
+    named = [b for b in branches if b is not None]
+    parts = []
+    if named:
+        parts.append(f"{alias}.branch IN ({', '.join(['%s'] * len(named))})")
+    if None in branches:
+        parts.append(f"{alias}.branch IS NULL")
+    return "(" + (" OR ".join(parts) or "FALSE") + ")", tuple(named)
+
+
+def load_period_aggregates(db, period, start_date, end_date, branches=None):
+    # Engine input (units frame, sale_days series) for a period, optionally
+    # limited to the salespeople of some branches
+    join, where, args = "", "", ()
+    if branches is not None:
+        condition, args = _branch_filter(branches)
+        join = "JOIN salespeople p ON p.id = a.employee_id"
+        where = f"AND {condition}"
+
+    db.execute(
+        f"""
+        SELECT a.employee_id, a.vehicle_type, a.units
+        FROM sales_monthly_units a
+        {join}
+        WHERE a.period_month = %s
+        {where}
+        ORDER BY a.first_record_id
+        """,
+        (period, *args)
+    )
+    units = pd.DataFrame(db.fetchall(), columns=["employee_id", "vehicle_type", "units"])
+
+    db.execute(
+        f"""
+        SELECT a.employee_id, COUNT(*) AS sale_days
+        FROM sales_employee_days a
+        {join}
+        WHERE a.sale_date BETWEEN %s AND %s
+        {where}
+        GROUP BY a.employee_id
+        """,
+        (start_date, end_date, *args)
+    )
+    rows = db.fetchall()
+    sale_days = pd.Series(
+        [r["sale_days"] for r in rows],
+        index=[r["employee_id"] for r in rows],
+        dtype="int64"
+    )
+
+    return units, sale_days
+
+
+############################ REBUILD (BACKFILL) #########################
+def rebuild_aggregates(conn, period=None):
+    # Recomputes the aggregates from sales_records, for one period or all
+    db = conn.cursor()
+    started = time.perf_counter()
+
+    if period is None:
+        db.execute("DELETE FROM sales_monthly_units")
+        db.execute("DELETE FROM sales_employee_days")
+        period_filter, args = "", ()
+    else:
+        start_date, end_date = period_bounds(period)
+        db.execute("DELETE FROM sales_monthly_units WHERE period_month = %s", (period,))
+        db.execute(
+            "DELETE FROM sales_employee_days WHERE sale_date BETWEEN %s AND %s",
+            (start_date, end_date)
+        )
+        period_filter, args = "WHERE sale_date BETWEEN %s AND %s", (start_date, end_date)
+
+    db.execute(
+        f"""
+        INSERT INTO sales_monthly_units
+        (period_month, employee_id, vehicle_type, units, first_record_id)
+        SELECT DATE_FORMAT(sale_date, '%%Y-%%m'), employee_id, vehicle_type,
+               SUM(quantity), MIN(id)
+        FROM sales_records
+        {period_filter}
+        GROUP BY DATE_FORMAT(sale_date, '%%Y-%%m'), employee_id, vehicle_type
+        """,
+        args
+    )
+    unit_rows = db.rowcount
+
+    db.execute(
+        f"""
+        INSERT IGNORE INTO sales_employee_days (sale_date, employee_id)
+        SELECT DISTINCT sale_date, employee_id
+        FROM sales_records
+        {period_filter}
+        """,
+        args
+    )
+    day_rows = db.rowcount
+
+    # Stored runs were computed from the old aggregates
+    if period is None:
+        db.execute("DELETE FROM calculation_runs")
+    else:
+        db.execute("DELETE FROM calculation_runs WHERE period_month = %s", (period,))
+
+    conn.commit()
+
+    return {
+        "period": period or "all",
+        "unit_rows": unit_rows,
+        "day_rows": day_rows,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+if __name__ == "__main__":
+    # python -m services.aggregates [--period 2025-09]
+    from database import get_connection
+
+    parser = argparse.ArgumentParser(description="Rebuild monthly sales aggregates")
+    parser.add_argument("--period", help="YYYY-MM; all periods when omitted")
+    options = parser.parse_args()
+
+    connection = get_connection()
+    try:
+        print(rebuild_aggregates(connection, options.period))
+    finally:
+        connection.close()
@@ -0,0 +1,57 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from database import get_connection
+from services.calculation import calculate_period
+
+RECALC_WORKERS = int(os.environ.get("RECALC_WORKERS", os.cpu_count() or 1))
+
+
+############################ PROCESS POOL WORKERS #########################
+# Every worker process opens its own connection once and receives the
+# salespeople master once, at start-up, instead of per period.
+_worker_conn = None
+_worker_salespeople = None
+
+
+def _init_worker(salespeople):
+    global _worker_salespeople
+    _worker_salespeople = salespeople
+
+
+def _worker_connection():
+    global _worker_conn
+    if _worker_conn is None or not _worker_conn.open:
+        _worker_conn = get_connection()
+    else:
+        _worker_conn.ping(reconnect=True)
+    return _worker_conn
+
+
+def _calculate_period(period):
+    started = time.perf_counter()
+    conn = None
+    try:
+        conn = _worker_connection()
+        result = calculate_period(conn, period, salespeople=_worker_salespeople)
+    except Exception as e:
+        if conn is not None and conn.open:
+            conn.rollback()
+        result = {"status": "failed", "period": period, "error": str(e)}
+
+    result.setdefault("period", period)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def recalculate_periods(periods, salespeople, workers=RECALC_WORKERS):
+    # Spawned (not forked) workers, so no pooled socket of the parent is
+    # ever shared with a child
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(workers, len(periods))),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(salespeople,)
+    ) as executor:
+        return list(executor.map(_calculate_period, periods))
@@ -0,0 +1,216 @@
+import os
+import time
+import hashlib
+import threading
+import importlib
+from collections import OrderedDict
+
+RESULTS_CACHE_SIZE = int(os.environ.get("RESULTS_CACHE_SIZE", 1024))
+RESULTS_CACHE_TTL = float(os.environ.get("RESULTS_CACHE_TTL", 300))
+# Invalidations only reach the process that made them; other workers
+# notice through cache_versions, read at most this often (seconds; 0 =
+# on every lookup). That bounds cross-worker staleness, not the TTL.
+RESULTS_CACHE_VERSION_INTERVAL = float(os.environ.get("RESULTS_CACHE_VERSION_INTERVAL", 1.0))
+# "module:Class" of an alternative backend (same methods as MemoryCacheBackend)
+RESULTS_CACHE_BACKEND = os.environ.get("RESULTS_CACHE_BACKEND")
+
+# Entries not tied to one period (all-period queries, salespeople list)
+# carry this tag and are dropped by every period invalidation
+ALL_PERIODS = "*"
+
+############################ SHARED VERSIONS #########################
+# Writers bump a period's row in the same transaction as the data it
+# covers (migrations/0012_cache_versions.sql); every worker compares the
+# versions it last saw and drops the periods that moved.
+BUMP_CACHE_VERSION = """
+    INSERT INTO cache_versions (period_month, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+CACHE_VERSIONS_QUERY = "SELECT period_month, version FROM cache_versions"
+
+
+############################ CACHE BACKENDS #########################
+class MemoryCacheBackend:
+    # Bounded LRU with per-entry expiry. Each entry carries tags so a
+    # whole group (e.g. everything about one period) can be dropped at once.
+
+    def __init__(self, max_entries=RESULTS_CACHE_SIZE, ttl=RESULTS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, tags, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags):
+        with self._lock:
+            self._entries[key] = (value, frozenset(tags), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        tags = set(tags)
+        with self._lock:
+            stale = [k for k, (_, entry_tags, _) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "evictions": self.evictions
+            }
+
+
+def _load_backend():
+    if not RESULTS_CACHE_BACKEND:
+        return MemoryCacheBackend()
+    module_name, _, class_name = RESULTS_CACHE_BACKEND.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+############################ RESPONSE CACHE #########################
+class CachedResponse:
+    def __init__(self, body, media_type="application/json", headers=None):
+        self.body = body
+        self.media_type = media_type
+        self.headers = dict(headers or {})
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        candidates = [t.strip() for t in if_none_match.split(",")]
+        return "*" in candidates or self.etag in candidates or "W/" + self.etag in candidates
+
+
+class ResponseCache:
+    # Serialized responses keyed by path + query. Tagged by period on write;
+    # calculation and ingestion commits invalidate by period, here directly
+    # and in other workers through cache_versions.
+
+    def __init__(self, backend=None, version_interval=RESULTS_CACHE_VERSION_INTERVAL):
+        self.backend = backend or _load_backend()
+        self.version_interval = version_interval
+        self._lock = threading.Lock()
+        self._versions = None
+        self._versions_checked = float("-inf")
+        # Bumped by every invalidation; a response whose lookup saw an older
+        # generation may have been built from data read before it, and is
+        # not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    @staticmethod
+    def key(path, params):
+        return path + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    def get(self, key):
+        cached = self.backend.get(key)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def set(self, key, cached, period=None, generation=None):
+        if generation is not None and generation != self.generation:
+            return False
+        self.backend.set(key, cached, {period or ALL_PERIODS})
+        return True
+
+    def versions_due(self):
+        # True when the caller should read cache_versions and pass the rows
+        # to apply_versions(); claims the check so concurrent lookups don't
+        # all query at once
+        now = time.monotonic()
+        with self._lock:
+            if now - self._versions_checked < self.version_interval:
+                return False
+            self._versions_checked = now
+            return True
+
+    def apply_versions(self, versions):
+        # versions: {period: version} as stored in cache_versions
+        with self._lock:
+            previous, self._versions = self._versions, dict(versions)
+        if previous is None:
+            # First read, done before the first lookup: nothing to compare
+            return 0
+        moved = [p for p, v in versions.items() if previous.get(p) != v]
+        if not moved:
+            return 0
+        with self._lock:
+            self.generation += 1
+            self.remote_invalidations += len(moved)
+        for period in moved:
+            self.backend.invalidate({period, ALL_PERIODS})
+        return len(moved)
+
+    def versions_failed(self):
+        # cache_versions could not be read: nothing cached can be vouched
+        # for, and the next lookup tries again
+        with self._lock:
+            self.generation += 1
+            self._versions_checked = float("-inf")
+        self.backend.clear()
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate_period(self, period):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+        return self.backend.invalidate({period, ALL_PERIODS})
+
+    def invalidate_periods(self, periods):
+        for period in set(periods):
+            self.invalidate_period(period)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations
+            }
+        counters.update(self.backend.stats())
+        return counters
+
+
+results_cache = ResponseCache()
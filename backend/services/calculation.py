@@ -0,0 +1,354 @@
+import numpy as np
+from services.engine import (
+    compute_incentives, compute_incentives_sharded,
+    partial_incentives, apply_top_cutoff, top_summary
+)
+from services.rule_plan import get_rule_plan
+from services.persistence import write_period_results
+from services.summaries import write_period_summary
+from services.cache import results_cache, BUMP_CACHE_VERSION
+from services.metrics import StageTimer
+from services.periods import period_bounds
+from services.aggregates import load_period_aggregates
+from services.locks import SingleFlight, advisory_lock, period_lock_name, CALC_LOCK_TIMEOUT
+
+
+def load_salespeople(db):
+    db.execute("SELECT id, branch, role FROM salespeople")
+    return db.fetchall()
+
+
+def _no_progress(stage, processed=None):
+    pass
+
+
+############################ RUN / CHANGE TRACKING #########################
+def change_version(db, period):
+    # The period's change version as of this transaction's snapshot. Versions
+    # are bumped in commit order, so every change up to it is visible here
+    # and every later one is logged with a higher version.
+    db.execute(
+        "SELECT version FROM sales_change_versions WHERE period_month=%s",
+        (period,)
+    )
+    row = db.fetchone()
+    return row["version"] if row else 0
+
+
+def record_calculation_run(db, period, version, summary):
+    db.execute(
+        """
+        INSERT INTO calculation_runs
+        (period_month, last_change_version, employee_count, top_n,
+         top_cutoff_units, completed_at)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            last_change_version = VALUES(last_change_version),
+            employee_count = VALUES(employee_count),
+            top_n = VALUES(top_n),
+            top_cutoff_units = VALUES(top_cutoff_units),
+            completed_at = VALUES(completed_at)
+        """,
+        (
+            period,
+            version,
+            summary["employee_count"],
+            summary["top_n"],
+            summary["top_cutoff_units"]
+        )
+    )
+
+
+############################ INCENTIVE CALCULATION RUN #########################
+def run_calculation(conn, period, progress=_no_progress, salespeople=None, sharded=False):
+    # Calculates and commits one period on the given connection. progress
+    # is called with the stage name as the run moves along (and the number
+    # of employees once known), for job status reporting. Batch runs pass
+    # an already loaded salespeople master; sharded runs the branch-sharded
+    # map/reduce engine across processes. Stage timings go to services.metrics.
+    stages = StageTimer("calculation", period=period, sharded=sharded)
+    with stages.run():
+        return _run_calculation(conn, period, progress, salespeople, sharded, stages)
+
+
+def _run_calculation(conn, period, progress, salespeople, sharded, stages):
+    db = conn.cursor()
+
+    # ------------------------------------
+    # 1. Parse period
+    # ------------------------------------
+    stages.mark("parse")
+    start_date, end_date = period_bounds(period)
+
+    # ------------------------------------
+    # 2. Fetch monthly aggregates
+    # ------------------------------------
+    progress("fetch")
+    stages.mark("fetch")
+    # Changes committed after this snapshot carry a higher version and are
+    # picked up by the next run
+    version = change_version(db, period)
+    progress("group")
+    stages.mark("group")
+    units, sale_days = load_period_aggregates(db, period, start_date, end_date)
+    stages.count("aggregate_rows", len(units))
+
+    if units.empty:
+        return {
+            "status": "success",
+            "message": "No sales found for given period"
+        }
+
+    # ------------------------------------
+    # 3. Load salespeople master
+    # ------------------------------------
+    stages.mark("salespeople")
+    if salespeople is None:
+        salespeople = load_salespeople(db)
+
+    # ------------------------------------
+    # 4. Compiled rule plan (cached per rule-set version and window)
+    # ------------------------------------
+    progress("rules")
+    stages.mark("rules")
+    plan = get_rule_plan(db, start_date, end_date)
+
+    # ------------------------------------
+    # 5. Branch totals, rankings, top 10% and
+    #    per employee calculation (columnar)
+    # ------------------------------------
+    progress("calculate")
+    stages.mark("calculate")
+    if sharded:
+        results = compute_incentives_sharded(
+            units, sale_days, salespeople, plan.slab_index, params=plan.params
+        )
+    else:
+        results = compute_incentives(units, sale_days, salespeople, plan.slab_index, plan.params)
+
+    # ------------------------------------
+    # 6. Save results (single transaction)
+    # ------------------------------------
+    progress("persist", len(results))
+    stages.mark("persist")
+    stages.count("employees", len(results))
+    rows_written, persist_seconds = write_period_results(db, period, results)
+    record_calculation_run(db, period, version, top_summary(units, plan.params))
+    write_period_summary(db, period, salespeople)
+
+    db.execute(BUMP_CACHE_VERSION, (period,))
+
+    stages.mark("commit")
+    conn.commit()
+    results_cache.invalidate_period(period)
+    stages.count("rows_written", rows_written)
+
+    return {
+        "status": "success",
+        "period": period,
+        "processed_salespeople": len(results),
+        "rule_set_version": plan.version,
+        "rows_written": rows_written,
+        "persist_seconds": persist_seconds
+    }
+
+
+############################ ONE RUN PER PERIOD #########################
+calculation_flights = SingleFlight()
+
+
+def _last_run(db, period):
+    db.execute(
+        "SELECT last_change_version, completed_at FROM calculation_runs WHERE period_month=%s",
+        (period,)
+    )
+    return db.fetchone()
+
+
+def calculate_period(conn, period, progress=_no_progress, sharded=False,
+                     incremental=False, salespeople=None):
+    # One execution per period at a time. Concurrent callers in this process
+    # asking for the same mode share the running one's result; other modes
+    # and other processes (uvicorn workers, batch workers) queue on the
+    # period's MySQL lock. Different periods don't block each other.
+    result, shared = calculation_flights.do(
+        (period, sharded, incremental),
+        lambda: _calculate_period_locked(conn, period, progress, sharded, incremental, salespeople),
+        timeout=CALC_LOCK_TIMEOUT
+    )
+    return {**result, "coalesced": True} if shared else result
+
+
+def _calculate_period_locked(conn, period, progress, sharded, incremental, salespeople):
+    db = conn.cursor()
+    before = _last_run(db, period)
+    conn.rollback()
+
+    with advisory_lock(conn, period_lock_name(period)) as waited:
+        # Fresh snapshot, so whatever the previous holder committed is visible
+        conn.rollback()
+
+        # The run we waited for already covers every change logged so far
+        if waited:
+            run = _last_run(db, period)
+            if run is not None and run != before and run["last_change_version"] == change_version(db, period):
+                conn.rollback()
+                return {
+                    "status": "success",
+                    "period": period,
+                    "message": "Calculated by a concurrent run",
+                    "coalesced": True
+                }
+
+        if incremental:
+            return run_incremental_calculation(conn, period, progress)
+        return run_calculation(conn, period, progress, salespeople=salespeople, sharded=sharded)
+
+
+############################ INCREMENTAL RECALCULATION #########################
+def run_incremental_calculation(conn, period, progress=_no_progress):
+    # Recomputes only the branches that gained sales since the period's last
+    # successful run. Branch totals, ranks and milestones are branch-local;
+    # the top-10% set is reused when nobody who changed reached its cutoff
+    # and the population is unchanged, otherwise this falls back to a full run.
+    stages = StageTimer("incremental", period=period)
+    with stages.run():
+        return _run_incremental_calculation(conn, period, progress, stages)
+
+
+def _run_incremental_calculation(conn, period, progress, stages):
+    db = conn.cursor()
+    stages.mark("parse")
+    start_date, end_date = period_bounds(period)
+
+    # ------------------------------------
+    # 1. What changed since the last run
+    # ------------------------------------
+    progress("fetch")
+    stages.mark("fetch")
+    db.execute("SELECT * FROM calculation_runs WHERE period_month=%s", (period,))
+    run = db.fetchone()
+    if run is None:
+        stages.mark("full_run")
+        return run_calculation(conn, period, progress)
+
+    version = change_version(db, period)
+    db.execute(
+        """
+        SELECT DISTINCT employee_id
+        FROM sales_changes
+        WHERE period_month=%s AND change_version > %s AND change_version <= %s
+        """,
+        (period, run["last_change_version"], version)
+    )
+    changes = db.fetchall()
+    if not changes:
+        return {
+            "status": "success",
+            "period": period,
+            "message": "No changes since last run",
+            "processed_salespeople": 0,
+            "incremental": True
+        }
+
+    changed_ids = {c["employee_id"] for c in changes}
+
+    # ------------------------------------
+    # 2. Affected branches and their aggregates
+    # ------------------------------------
+    stages.mark("salespeople")
+    salespeople = load_salespeople(db)
+    branch_of = {e["id"]: e["branch"] for e in salespeople}
+    branches = {branch_of[e] for e in changed_ids if e in branch_of}
+    affected = [e for e in salespeople if e["branch"] in branches]
+
+    # Employees new to the period change the population (and top_n)
+    db.execute(
+        f"""
+        SELECT employee_id FROM calculation_results
+        WHERE period_month=%s AND employee_id IN ({", ".join(["%s"] * len(changed_ids))})
+        """,
+        (period, *changed_ids)
+    )
+    if len(db.fetchall()) != len(changed_ids):
+        stages.mark("full_run")
+        return run_calculation(conn, period, progress)
+
+    progress("group")
+    stages.mark("group")
+    units, sale_days = load_period_aggregates(db, period, start_date, end_date, branches)
+    stages.count("aggregate_rows", len(units))
+
+    progress("rules")
+    stages.mark("rules")
+    plan = get_rule_plan(db, start_date, end_date)
+
+    progress("calculate")
+    stages.mark("calculate")
+    partial = partial_incentives(units, sale_days, affected, plan.slab_index, plan.params)
+
+    # ------------------------------------
+    # 3. Top 10%: reuse the stored set unless it may have moved
+    # ------------------------------------
+    cutoff = run["top_cutoff_units"]
+    changed = np.array([e in changed_ids for e in partial["employee_id"]], dtype=bool)
+    totals = partial["total_units"]
+    if (totals[changed] >= cutoff).any():
+        stages.mark("full_run")
+        return run_calculation(conn, period, progress)
+
+    tied = partial["employee_id"][totals == cutoff].tolist()
+    tied_members = set()
+    if tied:
+        db.execute(
+            f"""
+            SELECT employee_id FROM calculation_results
+            WHERE period_month=%s
+            AND is_top_performer = 1
+            AND employee_id IN ({", ".join(["%s"] * len(tied))})
+            """,
+            (period, *tied)
+        )
+        tied_members = {r["employee_id"] for r in db.fetchall()}
+
+    results = apply_top_cutoff(partial, cutoff, tied_members, plan.params)
+
+    # ------------------------------------
+    # 4. Save affected employees, run marker, summary
+    # ------------------------------------
+    progress("persist", len(results))
+    stages.mark("persist")
+    stages.count("employees", len(results))
+    rows_written, persist_seconds = write_period_results(
+        db, period, results,
+        employee_ids=[r["employee_id"] for r in results]
+    )
+    db.execute(
+        """
+        UPDATE calculation_runs
+        SET last_change_version=%s, completed_at=NOW()
+        WHERE period_month=%s
+        """,
+        (version, period)
+    )
+
+    # Dashboard summary over the whole period, this transaction's rows included
+    write_period_summary(db, period, salespeople)
+
+    db.execute(BUMP_CACHE_VERSION, (period,))
+
+    stages.mark("commit")
+    conn.commit()
+    results_cache.invalidate_period(period)
+    stages.count("rows_written", rows_written)
+
+    return {
+        "status": "success",
+        "period": period,
+        "processed_salespeople": len(results),
+        "rule_set_version": plan.version,
+        "rows_written": rows_written,
+        "persist_seconds": persist_seconds,
+        "incremental": True,
+        "branches": len(branches)
+    }
@@ -0,0 +1,420 @@
+import os
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from services.metrics import span
+
+SALES_COLUMNS = ["employee_id", "vehicle_type", "quantity", "sale_date"]
+
+BRANCH_MILESTONES = [(400, 10000), (300, 6000), (200, 3000)]
+CONSISTENCY_DAYS = 20
+CONSISTENCY_BONUS = 4000
+CROSS_SELL_TYPES = 3
+CROSS_SELL_BONUS = 3000
+RANK_BONUS = {0: 15000, 1: 10000, 2: 5000}
+TOP_PERCENT = 0.1
+TOP_UPLIFT = 0.5
+
+
+@dataclass(frozen=True)
+class BonusParams:
+    # Everything outside the slab rules that decides the payout. Stored as
+    # bonus_rules per rule-set version and compiled by services.rule_plan;
+    # the defaults are the version-1 values above. Milestones are
+    # (threshold, amount), highest first; rank_bonus[i] is paid to branch
+    # rank i + 1.
+    branch_milestones: tuple = tuple(BRANCH_MILESTONES)
+    consistency_days: int = CONSISTENCY_DAYS
+    consistency_bonus: float = CONSISTENCY_BONUS
+    cross_sell_types: int = CROSS_SELL_TYPES
+    cross_sell_bonus: float = CROSS_SELL_BONUS
+    rank_bonus: tuple = tuple(RANK_BONUS[r] for r in sorted(RANK_BONUS))
+    top_percent: float = TOP_PERCENT
+    top_uplift: float = TOP_UPLIFT
+
+
+DEFAULT_PARAMS = BonusParams()
+
+
+############################ SALES SUMMARY #########################
+def summarize_sales(sales):
+    # Collapse raw sales rows into per (employee, vehicle type) unit sums and
+    # per employee distinct sale days. Groups keep first-appearance order so
+    # ranking ties and breakdown order match the row-by-row calculation.
+    df = pd.DataFrame(sales, columns=SALES_COLUMNS)
+
+    units = (
+        df.groupby(["employee_id", "vehicle_type"], sort=False, dropna=False)["quantity"]
+        .sum()
+        .reset_index(name="units")
+    )
+    sale_days = df.groupby("employee_id", sort=False, dropna=False)["sale_date"].nunique()
+
+    return units, sale_days
+
+
+############################ INCENTIVE ENGINE #########################
+# The calculation is split in two so it can run sharded by branch:
+#   map    - _partial_incentives(): everything except the top-10% uplift.
+#            Branch totals, ranks and milestones only look at the rows
+#            passed in, so a shard must hold whole branches.
+#   reduce - _apply_top_performers(): global top-10% selection over every
+#            employee with sales, then the uplift and final ordering.
+# The single-process path is the same two steps over one shard.
+def _stable_desc_order(values):
+    # Indices sorted by value descending, ties kept in original order
+    return np.lexsort((np.arange(len(values)), -values))
+
+
+def top_performers(total_units, top_n):
+    # Same set as the first top_n of a stable descending sort, found with a
+    # partial selection: everything above the cut-off value plus the
+    # earliest employees tied on it
+    n = len(total_units)
+    is_top = np.zeros(n, dtype=bool)
+    if top_n >= n:
+        is_top[:] = True
+        return is_top
+
+    cutoff = np.partition(total_units, n - top_n)[n - top_n]
+    is_top[total_units > cutoff] = True
+    missing = top_n - int(is_top.sum())
+    is_top[np.flatnonzero(total_units == cutoff)[:missing]] = True
+    return is_top
+
+
+def master_frame(salespeople):
+    return pd.DataFrame(salespeople, columns=["id", "branch", "role"]).set_index("id")
+
+
+def _partial_incentives(units, sale_days, master, slab_index, params=DEFAULT_PARAMS, breakdown=True):
+    # ------------------------------------
+    # a. Per employee totals
+    # ------------------------------------
+    codes, emp_ids = pd.factorize(units["employee_id"], use_na_sentinel=False)
+    n = len(emp_ids)
+    unit_values = units["units"].to_numpy(dtype=np.int64)
+
+    total_units = np.zeros(n, dtype=np.int64)
+    np.add.at(total_units, codes, unit_values)
+    product_mix = np.bincount(codes, minlength=n)
+    days = sale_days.reindex(emp_ids).fillna(0).to_numpy(dtype=np.int64)
+
+    known = np.asarray(pd.Index(emp_ids).isin(master.index))
+    branches = master["branch"].reindex(emp_ids).to_numpy()
+    roles = master["role"].reindex(emp_ids).to_numpy()
+
+    # ------------------------------------
+    # b. Branch totals & rankings
+    # ------------------------------------
+    known_idx = np.flatnonzero(known)
+    branch_units = np.zeros(n, dtype=np.int64)
+    branch_rank = np.full(n, -1, dtype=np.int64)
+
+    if len(known_idx):
+        perf = pd.DataFrame({
+            "branch": branches[known_idx],
+            "total_units": total_units[known_idx],
+        }, index=known_idx)
+        grouped = perf.groupby("branch", sort=False, dropna=False)["total_units"]
+        branch_units[known_idx] = grouped.transform("sum").to_numpy()
+
+        ranked = perf.iloc[_stable_desc_order(perf["total_units"].to_numpy())]
+        branch_rank[ranked.index.to_numpy()] = (
+            ranked.groupby("branch", sort=False, dropna=False).cumcount().to_numpy()
+        )
+
+    # ------------------------------------
+    # c. Structured slab calculation
+    # ------------------------------------
+    unit_counts = units["units"].to_numpy()
+    matched = slab_index.lookup(roles[codes], units["vehicle_type"].to_numpy(), unit_counts)
+    slab_rows = np.flatnonzero(matched >= 0)
+    slab_rules = matched[slab_rows]
+    slab_codes = codes[slab_rows]
+    slab_amounts = (
+        slab_index.incentive_amount[slab_rules]
+        + (unit_counts[slab_rows] - slab_index.min_units[slab_rules])
+        * slab_index.bonus_per_unit[slab_rules]
+    )
+
+    # np.add.at accumulates in row order, matching a running Python sum
+    total = np.zeros(n, dtype=float)
+    np.add.at(total, slab_codes, slab_amounts)
+
+    # ------------------------------------
+    # d. Branch-local bonus stages
+    # ------------------------------------
+    milestone = np.zeros(n, dtype=np.int64)
+    if params.branch_milestones:
+        milestone = np.select(
+            [branch_units >= threshold for threshold, _ in params.branch_milestones],
+            [amount for _, amount in params.branch_milestones],
+            0
+        )
+    total = total + milestone
+
+    consistency = days >= params.consistency_days
+    total = total + np.where(consistency, params.consistency_bonus, 0)
+
+    cross_sell = product_mix >= params.cross_sell_types
+    total = total + np.where(cross_sell, params.cross_sell_bonus, 0)
+
+    rank_amount = np.zeros(n, dtype=np.asarray(params.rank_bonus or [0]).dtype)
+    for rank, amount in enumerate(params.rank_bonus):
+        rank_amount[branch_rank == rank] = amount
+    total = total + rank_amount
+
+    if not breakdown:
+        return {
+            "employee_id": np.asarray(emp_ids, dtype=object)[known_idx],
+            "total_units": total_units[known_idx],
+            "total": total[known_idx],
+            "branch": branches[known_idx],
+            "applied_rules": None
+        }
+
+    # ------------------------------------
+    # e. Breakdown (without the top-10% line)
+    # ------------------------------------
+    slab_lines = [[] for _ in range(n)]
+    for code, rule_id, vehicle_type, amount in zip(
+        slab_codes,
+        [slab_index.rule_ids[r] for r in slab_rules],
+        units["vehicle_type"].to_numpy()[slab_rows].tolist(),
+        slab_amounts.tolist()
+    ):
+        slab_lines[code].append({
+            "rule_id": rule_id,
+            "type": "Structured Slab",
+            "vehicle_type": None if pd.isna(vehicle_type) else vehicle_type,
+            "amount": round(amount, 2)
+        })
+
+    applied_rules = []
+    for i in known_idx.tolist():
+        lines = slab_lines[i]
+
+        if milestone[i]:
+            lines.append({"type": "Branch Milestone", "amount": milestone[i].item()})
+        if consistency[i]:
+            lines.append({"type": "Consistency Bonus", "amount": params.consistency_bonus})
+        if cross_sell[i]:
+            lines.append({"type": "Cross Sell Bonus", "amount": params.cross_sell_bonus})
+        if rank_amount[i]:
+            lines.append({
+                "type": "Branch Rank Bonus",
+                "rank": int(branch_rank[i]) + 1,
+                "amount": rank_amount[i].item()
+            })
+
+        applied_rules.append(lines)
+
+    return {
+        "employee_id": np.asarray(emp_ids, dtype=object)[known_idx],
+        "total_units": total_units[known_idx],
+        "total": total[known_idx],
+        "applied_rules": applied_rules
+    }
+
+
+def _global_totals(units):
+    codes, emp_ids = pd.factorize(units["employee_id"], use_na_sentinel=False)
+    total_units = np.zeros(len(emp_ids), dtype=np.int64)
+    np.add.at(total_units, codes, units["units"].to_numpy(dtype=np.int64))
+    return emp_ids, total_units
+
+
+def _top_count(employees, params):
+    return max(1, int(employees * params.top_percent))
+
+
+def top_summary(units, params=DEFAULT_PARAMS):
+    # Size of the population and the lowest unit total inside the top set,
+    # recorded per run so incremental runs can tell whether the set moved
+    emp_ids, total_units = _global_totals(units)
+    top_n = _top_count(len(emp_ids), params)
+    is_top = top_performers(total_units, top_n)
+    return {
+        "employee_count": len(emp_ids),
+        "top_n": top_n,
+        "top_cutoff_units": int(total_units[is_top].min()) if is_top.any() else 0
+    }
+
+
+def _finalize(ids, totals, lines, top, order, params=DEFAULT_PARAMS):
+    top_bonus = np.where(top, totals * params.top_uplift, 0.0)
+    totals = totals + top_bonus
+
+    results = []
+    for i in order.tolist():
+        applied_rules = lines[i]
+        if top[i]:
+            applied_rules.append({
+                "type": "Top 10 Percent Bonus",
+                "amount": round(float(top_bonus[i]), 2)
+            })
+
+        results.append({
+            "employee_id": ids[i],
+            "total_incentive": round(float(totals[i]), 2),
+            "applied_rules": applied_rules,
+            "top_performer": bool(top[i])
+        })
+
+    return results
+
+
+def _apply_top_performers(units, partials, params=DEFAULT_PARAMS):
+    # ------------------------------------
+    # Top 10% performers (global, incl. employees missing from the master)
+    # ------------------------------------
+    emp_ids, total_units = _global_totals(units)
+    is_top = top_performers(total_units, _top_count(len(emp_ids), params))
+
+    ids = np.concatenate([p["employee_id"] for p in partials])
+    totals = np.concatenate([p["total"] for p in partials])
+    lines = [rules for p in partials for rules in p["applied_rules"]]
+
+    # Back to global first-appearance order
+    positions = pd.Index(emp_ids).get_indexer(ids)
+    order = np.argsort(positions, kind="stable")
+
+    return _finalize(ids, totals, lines, is_top[positions], order, params)
+
+
+def apply_top_cutoff(partial, cutoff, tied_members=(), params=DEFAULT_PARAMS):
+    # Incremental path: the top set is known not to have moved, so membership
+    # of the recomputed employees follows from the stored cutoff; employees
+    # sitting exactly on it keep their previous membership (tied_members)
+    top = (partial["total_units"] > cutoff) | np.isin(
+        partial["employee_id"], list(tied_members)
+    )
+    return _finalize(
+        partial["employee_id"], partial["total"], partial["applied_rules"],
+        top, np.arange(len(top)), params
+    )
+
+
+def partial_incentives(units, sale_days, salespeople, slab_index, params=DEFAULT_PARAMS):
+    return _partial_incentives(units, sale_days, master_frame(salespeople), slab_index, params)
+
+
+def compute_incentives(units, sale_days, salespeople, slab_index, params=DEFAULT_PARAMS):
+    with span("engine", "branch_stages"):
+        partial = _partial_incentives(units, sale_days, master_frame(salespeople), slab_index, params)
+    with span("engine", "top_percent"):
+        return _apply_top_performers(units, [partial], params)
+
+
+def incentive_totals(units, sale_days, master, slab_index, params=DEFAULT_PARAMS):
+    # Final totals only, no breakdown lines: what-if simulation. Same
+    # stages as compute_incentives(); ids follow the partial's row order
+    # and the branch of each employee is returned alongside.
+    partial = _partial_incentives(units, sale_days, master, slab_index, params, breakdown=False)
+    emp_ids, total_units = _global_totals(units)
+    is_top = top_performers(total_units, _top_count(len(emp_ids), params))
+    top = is_top[pd.Index(emp_ids).get_indexer(partial["employee_id"])]
+
+    totals = partial["total"] + np.where(top, partial["total"] * params.top_uplift, 0.0)
+    return partial["employee_id"], partial["branch"], totals
+
+
+############################ BRANCH-SHARDED EXECUTION #########################
+ENGINE_WORKERS = int(os.environ.get("ENGINE_WORKERS", os.cpu_count() or 1))
+
+_shard_executor = None
+_shard_executor_workers = None
+_shard_executor_lock = threading.Lock()
+
+
+def _get_shard_executor(workers):
+    # One pool per process, rebuilt when asked for a different worker count.
+    # The old pool finishes the maps already submitted to it.
+    global _shard_executor, _shard_executor_workers
+    with _shard_executor_lock:
+        if _shard_executor is not None and _shard_executor_workers != workers:
+            _shard_executor.shutdown(wait=False)
+            _shard_executor = None
+        if _shard_executor is None:
+            _shard_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _shard_executor_workers = workers
+        return _shard_executor
+
+
+def _discard_shard_executor(executor):
+    # A worker died (OOM kill, segfault): the pool is unusable from then on.
+    # Only drop it if another thread hasn't replaced it already.
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is executor:
+            _shard_executor = None
+    executor.shutdown(wait=False)
+
+
+def _map_shards(shards, workers):
+    # One retry on a fresh pool; a second broken pool is raised
+    executor = _get_shard_executor(workers)
+    try:
+        return list(executor.map(_run_shard, shards))
+    except BrokenProcessPool:
+        _discard_shard_executor(executor)
+    return list(_get_shard_executor(workers).map(_run_shard, shards))
+
+
+def _run_shard(shard):
+    return _partial_incentives(*shard)
+
+
+def branch_shards(units, master, shard_count):
+    # Whole branches per shard, largest first onto the lightest shard.
+    # Rows keep their original order inside a shard.
+    branch = master["branch"].reindex(units["employee_id"]).to_numpy()
+    known = np.asarray(units["employee_id"].isin(master.index))
+
+    branch_codes, _ = pd.factorize(branch[known], use_na_sentinel=False)
+    rows_per_branch = np.bincount(branch_codes)
+
+    shard_of_branch = np.zeros(len(rows_per_branch), dtype=np.int64)
+    load = np.zeros(shard_count, dtype=np.int64)
+    for b in np.argsort(-rows_per_branch, kind="stable"):
+        shard_of_branch[b] = load.argmin()
+        load[shard_of_branch[b]] += rows_per_branch[b]
+
+    row_shard = np.full(len(units), -1, dtype=np.int64)
+    row_shard[known] = shard_of_branch[branch_codes]
+
+    return [units[row_shard == s] for s in range(shard_count) if load[s]]
+
+
+def compute_incentives_sharded(units, sale_days, salespeople, slab_index, workers=None, params=DEFAULT_PARAMS):
+    workers = workers or ENGINE_WORKERS
+    master = master_frame(salespeople)
+
+    shards = []
+    for shard_units in branch_shards(units, master, workers * 2):
+        employees = pd.unique(shard_units["employee_id"])
+        shards.append((
+            shard_units,
+            sale_days[sale_days.index.isin(employees)],
+            master[master.index.isin(employees)],
+            slab_index,
+            params
+        ))
+
+    # map: branch-local stages per shard, in parallel
+    with span("engine", "branch_stages"):
+        partials = _map_shards(shards, workers) if shards else []
+
+    # reduce: global top-10% merge
+    if not partials:
+        partials = [_partial_incentives(units.iloc[:0], sale_days.iloc[:0], master.iloc[:0], slab_index, params)]
+    with span("engine", "top_percent"):
+        return _apply_top_performers(units, partials, params)
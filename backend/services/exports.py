@@ -0,0 +1,131 @@
+import os
+import io
+import csv
+import json
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FETCH_SIZE = int(os.environ.get("EXPORT_FETCH_SIZE", 5000))
+
+EXPORT_COLUMNS = ["employee_id", "period_month", "total_incentive", "breakdown_json", "status"]
+EXPORT_FORMATS = {
+    # format: (media type, file extension)
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+############################ ROW BATCH ENCODERS #########################
+# Each encoder turns an async iterator of row batches (lists of dicts) into
+# an async iterator of bytes, holding one batch in memory at a time.
+async def encode_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows([r[c] for c in EXPORT_COLUMNS] for r in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def encode_ndjson(batches):
+    async for rows in batches:
+        yield "".join(
+            json.dumps({c: r[c] for c in EXPORT_COLUMNS}) + "\n" for r in rows
+        ).encode()
+
+
+class _ChunkSink:
+    # Write-only file for pyarrow writers that hands written bytes back in
+    # pieces; tell() keeps counting so Parquet footer offsets stay right
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("employee_id", pa.string()),
+        ("period_month", pa.string()),
+        ("total_incentive", pa.float64()),
+        ("breakdown_json", pa.string()),
+        ("status", pa.string()),
+    ])
+
+
+async def _encode_arrow(batches, open_writer):
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = open_writer(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        async for rows in batches:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def encode_parquet(batches):
+    # One row group per fetched batch
+    return _encode_arrow(batches, pq.ParquetWriter)
+
+
+def encode_arrow(batches):
+    return _encode_arrow(batches, pa.ipc.new_stream)
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet,
+    "arrow": encode_arrow,
+}
+
+
+def check_export_format(fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', use one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise ValueError(f"{fmt} export requires pyarrow to be installed")
+
+
+async def gzip_stream(chunks, level=6):
+    # wbits=31 writes a gzip container (header + CRC trailer)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
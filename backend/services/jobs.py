@@ -0,0 +1,106 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from database import pool
+from services.calculation import calculate_period
+
+CALC_WORKERS = int(os.environ.get("CALC_WORKERS", 2))
+CALC_JOB_HISTORY = int(os.environ.get("CALC_JOB_HISTORY", 500))
+
+
+############################ CALCULATION JOB QUEUE #########################
+class CalculationJob:
+    def __init__(self, period, sharded=False, incremental=False):
+        self.id = uuid.uuid4().hex
+        self.period = period
+        self.sharded = sharded
+        self.incremental = incremental
+        self.status = "queued"
+        self.stage = None
+        self.employees_processed = 0
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def progress(self, stage, processed=None):
+        self.stage = stage
+        if processed is not None:
+            self.employees_processed = processed
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "period": self.period,
+            "status": self.status,
+            "stage": self.stage,
+            "employees_processed": self.employees_processed,
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class CalculationJobQueue:
+    # In-process worker pool; each job borrows its own pooled connection.
+    # Finished jobs are kept for polling up to CALC_JOB_HISTORY entries.
+    # A request for a period and mode (sharded, incremental) that already
+    # has a job queued or running gets that job back.
+
+    def __init__(self, workers=CALC_WORKERS, history=CALC_JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calc-job")
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, period, sharded=False, incremental=False):
+        with self._lock:
+            key = (period, sharded, incremental)
+            active = self._active.get(key)
+            if active is not None:
+                return active
+
+            job = CalculationJob(period, sharded, incremental)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._history:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            with pool.connection() as conn:
+                try:
+                    job.result = calculate_period(
+                        conn, job.period, job.progress,
+                        sharded=job.sharded, incremental=job.incremental
+                    )
+                except Exception:
+                    conn.rollback()
+                    raise
+            job.progress("done")
+            job.status = "succeeded"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active.pop((job.period, job.sharded, job.incremental), None)
+
+
+calculation_jobs = CalculationJobQueue()
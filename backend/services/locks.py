@@ -0,0 +1,79 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Seconds a calculation waits for another session's run of the same period
+CALC_LOCK_TIMEOUT = int(os.environ.get("CALC_LOCK_TIMEOUT", 600))
+
+
+class LockTimeout(RuntimeError):
+    pass
+
+
+############################ IN-PROCESS SINGLE FLIGHT #########################
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent do() calls with the same key run fn once; the callers that
+    # arrive while it runs wait and get the same result (or exception).
+    # Waiters give up with LockTimeout after timeout seconds, so a hung
+    # leader doesn't hang every thread behind it.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn, timeout=None):
+        # Returns (result, shared): shared is True for the waiting callers
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise LockTimeout(f"Timed out waiting for the running call of {key}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+############################ MYSQL ADVISORY LOCKS #########################
+# GET_LOCK locks belong to the session, not the transaction: commits and
+# rollbacks inside the block keep it, and a dropped connection releases it.
+def period_lock_name(period):
+    return f"incentive_calc:{period}"
+
+
+@contextmanager
+def advisory_lock(conn, name, timeout=CALC_LOCK_TIMEOUT):
+    # Yields True when another session held the lock and this one waited
+    db = conn.cursor()
+    db.execute("SELECT GET_LOCK(%s, 0) AS acquired", (name,))
+    waited = not db.fetchone()["acquired"]
+    if waited:
+        db.execute("SELECT GET_LOCK(%s, %s) AS acquired", (name, timeout))
+        if not db.fetchone()["acquired"]:
+            raise LockTimeout(f"Timed out waiting for lock {name}")
+
+    try:
+        yield waited
+    finally:
+        db.execute("SELECT RELEASE_LOCK(%s)", (name,))
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# One structured log line per calculation / ingestion run when enabled
+METRICS_LOG_RUNS = os.environ.get("METRICS_LOG_RUNS", "0").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+logger = logging.getLogger("incentive.metrics")
+
+
+############################ REGISTRY #########################
+# Process-local counters and histograms rendered in the Prometheus text
+# format. Work done in spawned worker processes (batch recalculation,
+# engine shards) is timed from the parent where it is awaited.
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = self._key(labels)
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _labels(key, extra=()):
+        pairs = list(key) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{self._labels(key)} {value}")
+
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{self._labels(key, [('le', '+Inf')])} {h.count}")
+                    lines.append(f"{name}_sum{self._labels(key)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{self._labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("incentive_stage_seconds", "Time spent per pipeline stage")
+registry.describe("incentive_run_seconds", "Wall time per calculation/ingestion run")
+registry.describe("incentive_runs_total", "Runs by pipeline and outcome")
+registry.describe("incentive_rows_total", "Rows processed per pipeline stage")
+registry.describe("db_query_seconds", "Database statement duration by operation")
+registry.describe("db_queries_total", "Database statements by operation")
+registry.describe("http_request_seconds", "Request duration by route")
+registry.describe("http_requests_total", "Requests by route and status")
+
+
+############################ RUN / STAGE TIMING #########################
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+
+
+def _operation(sql):
+    word = sql.lstrip().split(None, 1)
+    return word[0].upper() if word else "UNKNOWN"
+
+
+def record_query(sql, seconds):
+    operation = _operation(sql)
+    registry.inc("db_queries_total", operation=operation)
+    registry.observe("db_query_seconds", seconds, operation=operation)
+    run = _current_run.get()
+    if run is not None:
+        run.queries += 1
+        run.query_seconds += seconds
+
+
+class StageTimer:
+    # Times consecutive stages of one run: mark("fetch") ends the previous
+    # stage and starts the next. finish() closes the run, records its
+    # outcome and, with METRICS_LOG_RUNS, logs one JSON line. Until then it
+    # also collects the DB statements issued from its thread / async task.
+
+    def __init__(self, pipeline, **context):
+        self.pipeline = pipeline
+        self.context = context
+        self.stages = {}
+        self.rows = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self._stage = None
+        self._stage_started = None
+        self._started = time.perf_counter()
+        self._finished = False
+        self._token = _current_run.set(self)
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self._close_stage(now)
+        self._stage, self._stage_started = stage, now
+
+    def _close_stage(self, now):
+        if self._stage is None:
+            return
+        seconds = now - self._stage_started
+        self.stages[self._stage] = self.stages.get(self._stage, 0.0) + seconds
+        registry.observe("incentive_stage_seconds", seconds, pipeline=self.pipeline, stage=self._stage)
+        self._stage = None
+
+    def count(self, stage, rows):
+        self.rows[stage] = self.rows.get(stage, 0) + rows
+        registry.inc("incentive_rows_total", rows, pipeline=self.pipeline, stage=stage)
+
+    def finish(self, status="success"):
+        if self._finished:
+            return
+        self._finished = True
+        now = time.perf_counter()
+        self._close_stage(now)
+        try:
+            _current_run.reset(self._token)
+        except ValueError:
+            # finished from another context; just detach
+            _current_run.set(None)
+        seconds = now - self._started
+        registry.inc("incentive_runs_total", pipeline=self.pipeline, status=status)
+        registry.observe("incentive_run_seconds", seconds, pipeline=self.pipeline)
+
+        if METRICS_LOG_RUNS:
+            logger.info(json.dumps({
+                "event": f"{self.pipeline}_run",
+                "status": status,
+                **self.context,
+                "seconds": round(seconds, 4),
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "rows": self.rows,
+                "db_queries": self.queries,
+                "db_seconds": round(self.query_seconds, 4)
+            }, default=str))
+
+    @contextmanager
+    def run(self):
+        # finish() on the way out, "failed" when an exception escapes
+        try:
+            yield self
+        except Exception:
+            self.finish("failed")
+            raise
+        self.finish()
+
+
+@contextmanager
+def span(pipeline, stage):
+    # Standalone stage timing, for code that runs outside a StageTimer
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(
+            "incentive_stage_seconds", time.perf_counter() - started,
+            pipeline=pipeline, stage=stage
+        )
+
+
+def render_metrics():
+    return registry.render()
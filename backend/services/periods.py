@@ -0,0 +1,30 @@
+import calendar
+from datetime import datetime
+
+
+def _parse_period(period):
+    try:
+        return datetime.strptime(period, "%Y-%m")
+    except ValueError:
+        raise ValueError(f"Invalid period {period!r}, expected YYYY-MM") from None
+
+
+def period_bounds(period):
+    dt = _parse_period(period)
+    start_date = dt.date().replace(day=1)
+    last_day = calendar.monthrange(start_date.year, start_date.month)[1]
+    return start_date, start_date.replace(day=last_day)
+
+
+def period_range(start_period, end_period):
+    start = _parse_period(start_period)
+    end = _parse_period(end_period)
+    if end < start:
+        raise ValueError("end_period must not be before start_period")
+
+    periods = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        periods.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
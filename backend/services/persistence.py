@@ -0,0 +1,90 @@
+import os
+import json
+import time
+from datetime import date
+
+RESULTS_BATCH_SIZE = int(os.environ.get("RESULTS_BATCH_SIZE", 1000))
+
+
+############################ BULK RESULT WRITER #########################
+def write_period_results(db, period, results, batch_size=None, employee_ids=None):
+    # Replaces a period's calculation_results and their breakdown lines in
+    # one transaction: one DELETE for the period (or only for employee_ids
+    # on incremental runs), then multi-row INSERTs in batches. Nothing is committed here, so readers
+    # keep seeing the previous period until the caller commits.
+    # Returns (rows_written, seconds).
+    batch_size = batch_size or RESULTS_BATCH_SIZE
+    started = time.perf_counter()
+    today = date.today()
+
+    for table in ("calculation_results", "calculation_result_lines"):
+        if employee_ids is None:
+            db.execute(
+                f"DELETE FROM {table} WHERE period_month=%s",
+                (period,)
+            )
+        else:
+            employee_ids = list(employee_ids)
+            for i in range(0, len(employee_ids), batch_size):
+                batch = employee_ids[i:i + batch_size]
+                db.execute(
+                    f"""
+                    DELETE FROM {table}
+                    WHERE period_month=%s
+                    AND employee_id IN ({", ".join(["%s"] * len(batch))})
+                    """,
+                    (period, *batch)
+                )
+
+    rows = [
+        (
+            r["employee_id"],
+            period,
+            r["total_incentive"],
+            json.dumps(r["applied_rules"]),
+            r["top_performer"],
+            "Success",
+            today
+        )
+        for r in results
+    ]
+
+    for i in range(0, len(rows), batch_size):
+        db.executemany(
+            """
+            INSERT INTO calculation_results
+            (employee_id, period_month, total_incentive,
+             breakdown_json, is_top_performer, status, calculated_at)
+            VALUES (%s,%s,%s,%s,%s,%s,%s)
+            """,
+            rows[i:i + batch_size]
+        )
+
+    # One row per applied rule, for SQL-side breakdown analysis
+    lines = [
+        (
+            period,
+            r["employee_id"],
+            line_no,
+            line["type"],
+            line.get("rule_id"),
+            line.get("vehicle_type"),
+            line.get("rank"),
+            line["amount"]
+        )
+        for r in results
+        for line_no, line in enumerate(r["applied_rules"])
+    ]
+
+    for i in range(0, len(lines), batch_size):
+        db.executemany(
+            """
+            INSERT INTO calculation_result_lines
+            (period_month, employee_id, line_no, line_type, rule_id,
+             vehicle_type, rank_position, amount)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            """,
+            lines[i:i + batch_size]
+        )
+
+    return len(rows), round(time.perf_counter() - started, 3)
@@ -0,0 +1,176 @@
+import os
+import csv
+import datetime
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# CSV uploads up to this size are parsed in one multithreaded pass; larger
+# ones stream block by block (single-threaded) so memory stays bounded
+READER_THREADED_MAX_BYTES = int(os.environ.get("READER_THREADED_MAX_BYTES", 256 << 20))
+READER_BLOCK_SIZE = int(os.environ.get("READER_BLOCK_SIZE", 4 << 20))
+
+UPLOAD_FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".xlsx": "xlsx"}
+
+
+############################ UPLOAD SCHEMAS #########################
+# Every upload column is read as text: typing is the validator's job
+# (vectorized checks first, then the Pydantic schema for anything else), so
+# the parser never guesses a dtype from the first rows of a file.
+def schema_columns(model):
+    return list(model.model_fields)
+
+
+def upload_format(filename):
+    # Files without a known extension are treated as CSV, as before
+    return UPLOAD_FORMATS.get(os.path.splitext(filename or "")[1].lower(), "csv")
+
+
+def row_values(row):
+    # Row of a frame -> kwargs for a Pydantic schema, missing cells as None
+    return {k: None if not isinstance(v, str) and pd.isna(v) else v for k, v in row.items()}
+
+
+############################ ARROW READERS #########################
+def _rechunk(tables, chunk_size):
+    # Tables / record batches of any size -> tables of exactly chunk_size
+    # rows (the last one shorter)
+    pending, pending_rows = [], 0
+    for table in tables:
+        if not isinstance(table, pa.Table):
+            table = pa.Table.from_batches([table])
+        pending.append(table)
+        pending_rows += table.num_rows
+        while pending_rows >= chunk_size:
+            combined = pa.concat_tables(pending)
+            yield combined.slice(0, chunk_size)
+            pending = [combined.slice(chunk_size)]
+            pending_rows -= chunk_size
+    if pending_rows:
+        yield pa.concat_tables(pending)
+
+
+def _as_text(column):
+    # Arrow column -> string column; whole-day timestamps print as dates
+    if pa.types.is_string(column.type):
+        return column
+    if pa.types.is_timestamp(column.type):
+        days = pc.cast(column, pa.date32())
+        if pc.all(pc.equal(pc.cast(days, column.type), column)).as_py() is not False:
+            column = days
+    return pc.cast(column, pa.string())
+
+
+def _text_table(table, columns):
+    present = [c for c in columns if c in table.column_names]
+    return pa.table({c: _as_text(table.column(c)) for c in present})
+
+
+def _csv_header(f):
+    f.seek(0)
+    first = f.readline()
+    f.seek(0)
+    if isinstance(first, bytes):
+        first = first.decode("utf-8-sig", errors="replace")
+    return next(csv.reader([first]), [])
+
+
+def _csv_tables(f, columns, chunk_size):
+    present = [c for c in columns if c in _csv_header(f)]
+    convert = pa_csv.ConvertOptions(
+        column_types={c: pa.string() for c in present},
+        include_columns=present,
+        strings_can_be_null=True
+    )
+
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+
+    if size <= READER_THREADED_MAX_BYTES:
+        table = pa_csv.read_csv(
+            f, read_options=pa_csv.ReadOptions(use_threads=True), convert_options=convert
+        )
+        yield from _rechunk([table], chunk_size)
+    else:
+        reader = pa_csv.open_csv(
+            f, read_options=pa_csv.ReadOptions(block_size=READER_BLOCK_SIZE), convert_options=convert
+        )
+        yield from _rechunk(reader, chunk_size)
+
+
+def _parquet_tables(f, columns, chunk_size):
+    parquet = pq.ParquetFile(f)
+    present = [c for c in columns if c in parquet.schema_arrow.names]
+    batches = parquet.iter_batches(batch_size=chunk_size, columns=present or None)
+    for table in _rechunk(batches, chunk_size):
+        yield _text_table(table, columns)
+
+
+def _cell_text(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _xlsx_tables(f, columns, chunk_size):
+    # openpyxl has no streaming columnar path: the first sheet is loaded
+    # whole, then converted to text columns
+    sheet = pd.read_excel(f, dtype=object, usecols=lambda c: c in columns, engine="openpyxl")
+    table = pa.table({
+        c: pa.array([_cell_text(v) for v in sheet[c].tolist()], type=pa.string())
+        for c in columns if c in sheet.columns
+    })
+    yield from _rechunk([table], chunk_size)
+
+
+ARROW_READERS = {"csv": _csv_tables, "parquet": _parquet_tables, "xlsx": _xlsx_tables}
+
+
+############################ FRAMES FOR VALIDATION #########################
+def _pandas_csv_frames(f, columns, chunk_size):
+    # Without pyarrow: pandas' CSV parser, still reading every column as text
+    f.seek(0)
+    with pd.read_csv(f, chunksize=chunk_size, dtype=str) as reader:
+        for frame in reader:
+            yield frame[[c for c in columns if c in frame.columns]]
+
+
+def iter_upload_frames(f, filename, columns, chunk_size):
+    # DataFrames of at most chunk_size rows with the upload's `columns` that
+    # exist in the file, as text columns (Arrow-backed when pyarrow is
+    # installed), indexed by row position in the file like pd.read_csv's
+    # chunks. Missing columns are simply absent for the caller to report.
+    fmt = upload_format(filename)
+    if pa is None:
+        if fmt != "csv":
+            raise ValueError(f"{fmt} uploads require pyarrow to be installed")
+        yield from _pandas_csv_frames(f, columns, chunk_size)
+        return
+
+    offset = 0
+    for table in ARROW_READERS[fmt](f, columns, chunk_size):
+        frame = table.to_pandas(types_mapper=pd.ArrowDtype)
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        offset += len(frame)
+        yield frame
+
+
+def read_upload(f, filename, columns):
+    # Whole upload as one frame (rule sheets are small)
+    frames = list(iter_upload_frames(f, filename, columns, chunk_size=1 << 20))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames) if len(frames) > 1 else frames[0]
@@ -0,0 +1,217 @@
+import os
+import threading
+from collections import OrderedDict
+from services.engine import BonusParams
+from services.slab_index import SlabIndex
+
+# Compiled plans kept per process: (version, validity window) -> RulePlan
+RULE_PLAN_CACHE_SIZE = int(os.environ.get("RULE_PLAN_CACHE_SIZE", 32))
+
+BONUS_RULE_TYPES = ("Branch Milestone", "Consistency", "Cross Sell", "Branch Rank", "Top Percent")
+# Rule types with a single threshold / amount pair
+SINGLE_RULE_TYPES = ("Consistency", "Cross Sell", "Top Percent")
+# Highest Branch Rank threshold: calculation_result_lines.rank_position is a
+# SMALLINT UNSIGNED, and compile_bonus_params sizes rank_bonus by it
+MAX_BRANCH_RANK = 65535
+
+
+############################ RULE PLAN #########################
+class RulePlan:
+    # One rule-set version compiled for one validity window: the slab
+    # interval index plus the bonus stage parameters, i.e. everything the
+    # engine's columnar stages read. Immutable once built.
+
+    def __init__(self, version, slab_index, params):
+        self.version = version
+        self.slab_index = slab_index
+        self.params = params
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "slab_rules": len(self.slab_index.rule_ids),
+            "branch_milestones": [list(m) for m in self.params.branch_milestones],
+            "consistency_days": self.params.consistency_days,
+            "consistency_bonus": self.params.consistency_bonus,
+            "cross_sell_types": self.params.cross_sell_types,
+            "cross_sell_bonus": self.params.cross_sell_bonus,
+            "rank_bonus": list(self.params.rank_bonus),
+            "top_percent": self.params.top_percent,
+            "top_uplift": self.params.top_uplift
+        }
+
+
+def _number(value):
+    # DOUBLE columns come back as floats; whole amounts stay ints so the
+    # breakdown JSON doesn't change with the storage type
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def check_bonus_rules(rows):
+    # rows: (rule_type, threshold, amount). Raises ValueError on a set the
+    # engine can't run.
+    seen, per_type = set(), {}
+    for rule_type, threshold, amount in rows:
+        if rule_type not in BONUS_RULE_TYPES:
+            raise ValueError(f"Unknown bonus rule type: {rule_type}")
+        if threshold < 0 or amount < 0:
+            raise ValueError(f"{rule_type}: threshold and amount must not be negative")
+        if rule_type == "Branch Rank" and (threshold < 1 or not float(threshold).is_integer()):
+            raise ValueError("Branch Rank threshold must be a rank (1, 2, ...)")
+        if rule_type == "Branch Rank" and threshold > MAX_BRANCH_RANK:
+            raise ValueError(f"Branch Rank threshold must not exceed {MAX_BRANCH_RANK}")
+        if rule_type == "Top Percent" and not 0 < threshold <= 1:
+            raise ValueError("Top Percent threshold must be a share between 0 and 1")
+        if (rule_type, threshold) in seen:
+            raise ValueError(f"{rule_type}: threshold {threshold} given more than once")
+        seen.add((rule_type, threshold))
+        per_type[rule_type] = per_type.get(rule_type, 0) + 1
+
+    for rule_type in SINGLE_RULE_TYPES:
+        if per_type.get(rule_type, 0) > 1:
+            raise ValueError(f"{rule_type}: only one rule allowed")
+
+
+def compile_bonus_params(rows):
+    # bonus_rules rows -> engine BonusParams. A missing single-value rule
+    # type switches its stage off.
+    by_type = {}
+    for r in rows:
+        by_type.setdefault(r["rule_type"], []).append((r["threshold"], r["amount"]))
+
+    def single(rule_type):
+        values = by_type.get(rule_type)
+        return values[0] if values else None
+
+    milestones = tuple(
+        (_number(threshold), _number(amount))
+        for threshold, amount in sorted(by_type.get("Branch Milestone", []), key=lambda m: -m[0])
+    )
+
+    ranks = {int(threshold): _number(amount) for threshold, amount in by_type.get("Branch Rank", [])}
+    rank_bonus = tuple(ranks.get(rank, 0) for rank in range(1, max(ranks, default=0) + 1))
+
+    consistency = single("Consistency") or (float("inf"), 0)
+    cross_sell = single("Cross Sell") or (float("inf"), 0)
+    top = single("Top Percent") or (BonusParams.top_percent, 0)
+
+    return BonusParams(
+        branch_milestones=milestones,
+        consistency_days=_number(consistency[0]),
+        consistency_bonus=_number(consistency[1]),
+        cross_sell_types=_number(cross_sell[0]),
+        cross_sell_bonus=_number(cross_sell[1]),
+        rank_bonus=rank_bonus,
+        top_percent=float(top[0]),
+        top_uplift=float(top[1])
+    )
+
+
+############################ LOADING #########################
+def current_rule_version(db):
+    db.execute("SELECT COALESCE(MAX(version), 0) AS version FROM rule_sets")
+    return db.fetchone()["version"]
+
+
+def load_structured_rules(db, start_date, end_date, version):
+    db.execute(
+        """
+        SELECT *
+        FROM incentive_rules
+        WHERE rule_type='Structured'
+        AND valid_from <= %s
+        AND valid_to >= %s
+        AND rule_set_version <= %s
+        """,
+        (end_date, start_date, version)
+    )
+    return db.fetchall()
+
+
+def load_bonus_rules(db, version):
+    db.execute(
+        """
+        SELECT rule_type, threshold, amount
+        FROM bonus_rules
+        WHERE rule_set_version = %s
+        """,
+        (version,)
+    )
+    return db.fetchall()
+
+
+def compile_rule_plan(db, version, start_date, end_date):
+    return RulePlan(
+        version,
+        SlabIndex(load_structured_rules(db, start_date, end_date, version)),
+        compile_bonus_params(load_bonus_rules(db, version))
+    )
+
+
+############################ PLAN CACHE #########################
+# A version never changes once published, so a cached plan is only ever
+# replaced by a newer version. Every lookup costs one MAX(version) query;
+# a rule upload in any process is picked up by the next calculation.
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def get_rule_plan(db, start_date, end_date):
+    version = current_rule_version(db)
+    key = (version, start_date, end_date)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+
+    plan = compile_rule_plan(db, version, start_date, end_date)
+    with _plans_lock:
+        # Plans of older versions won't be asked for again
+        for stale in [k for k in _plans if k[0] < version]:
+            del _plans[stale]
+        _plans[key] = plan
+        while len(_plans) > RULE_PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def reload_rule_plans():
+    with _plans_lock:
+        _plans.clear()
+
+
+############################ PUBLISHING #########################
+async def publish_rule_set(db, source, bonus_rules=()):
+    # Opens a new version in the caller's transaction. Bonus rules of the
+    # previous version are carried over for every rule type not replaced
+    # by bonus_rules [(rule_type, threshold, amount), ...].
+    await db.execute("INSERT INTO rule_sets (source) VALUES (%s)", (source,))
+    version = db.lastrowid
+
+    replaced = sorted({rule_type for rule_type, _, _ in bonus_rules})
+    keep = f"AND rule_type NOT IN ({', '.join(['%s'] * len(replaced))})" if replaced else ""
+    await db.execute(
+        f"""
+        INSERT INTO bonus_rules (rule_set_version, rule_type, threshold, amount)
+        SELECT %s, rule_type, threshold, amount
+        FROM bonus_rules
+        WHERE rule_set_version = (
+            SELECT MAX(version) FROM rule_sets WHERE version < %s
+        )
+        {keep}
+        """,
+        (version, version, *replaced)
+    )
+
+    if bonus_rules:
+        await db.executemany(
+            """
+            INSERT INTO bonus_rules (rule_set_version, rule_type, threshold, amount)
+            VALUES (%s, %s, %s, %s)
+            """,
+            [(version, *rule) for rule in bonus_rules]
+        )
+
+    return version
@@ -0,0 +1,279 @@
+import os
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+from models import SalesRowSchema
+from services.aggregates import FOLD_BATCH_UNITS, FOLD_BATCH_DAYS
+from services.readers import row_values
+from services.cache import BUMP_CACHE_VERSION
+
+INGEST_INSERT_BATCH = int(os.environ.get("INGEST_INSERT_BATCH", 5000))
+
+STRING_COLUMNS = ["Employee_ID", "Branch", "Role", "Vehicle_Model", "Vehicle_Type"]
+SALES_FRAME_COLUMNS = [
+    "row", "employee_id", "branch", "role", "vehicle_model",
+    "quantity", "sale_date", "vehicle_type"
+]
+
+ISO_DATE = r"^\d{4}-\d{2}-\d{2}$"
+
+# Joins the natural key fields of a row before hashing (ASCII unit separator)
+ROW_KEY_SEPARATOR = "\x1f"
+FILE_HASH_BLOCK = 1 << 20
+
+
+############################ VECTORIZED VALIDATION #########################
+# Column checks only accept values SalesRowSchema is certain to accept with
+# the same result. Every other row is validated by SalesRowSchema itself, so
+# failed_rows keeps exactly the errors the per-row path reported.
+def _is_text(col):
+    # String columns as produced by services.readers (Arrow-backed, or
+    # pandas' string dtype): every cell is a str or missing
+    dtype = col.dtype
+    return isinstance(dtype, pd.StringDtype) or (isinstance(dtype, pd.ArrowDtype) and dtype.type is str)
+
+
+def _is_str(col, min_length=0):
+    if _is_text(col):
+        return (col.str.len() >= min_length).fillna(False).to_numpy(dtype=bool)
+    return col.map(lambda v: isinstance(v, str) and len(v) >= min_length).to_numpy(dtype=bool)
+
+
+def _quantity(col):
+    if _is_text(col):
+        # Plain digit strings parse to the same int in SalesRowSchema
+        ok = col.str.fullmatch(r"\d{1,18}").fillna(False).to_numpy(dtype=bool)
+        values = np.zeros(len(col), dtype=np.int64)
+        values[ok] = col[ok].astype("int64").to_numpy(dtype=np.int64)
+        return ok & (values > 0), values
+    if pd.api.types.is_bool_dtype(col.dtype):
+        return np.zeros(len(col), dtype=bool), None
+    if pd.api.types.is_integer_dtype(col.dtype):
+        values = col.to_numpy(dtype=np.int64)
+        return values > 0, values
+    if pd.api.types.is_float_dtype(col.dtype):
+        values = col.to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            ok = np.isfinite(values) & (values == np.floor(values)) & (values > 0)
+        return ok, np.where(ok, values, 0).astype(np.int64)
+    return np.zeros(len(col), dtype=bool), None
+
+
+def _sale_date(col):
+    if _is_text(col):
+        text = col
+    else:
+        text = col.astype(object).where(col.map(lambda v: isinstance(v, str)), None)
+    ok = text.str.match(ISO_DATE).fillna(False).astype(bool)
+    parsed = pd.to_datetime(text.where(ok), format="%Y-%m-%d", errors="coerce")
+    ok = ok & parsed.notna()
+    return ok.to_numpy(dtype=bool), parsed
+
+
+def validate_sales_frame(df):
+    # Returns (frame of valid rows in SALES_FRAME_COLUMNS, failed_rows)
+    clean = np.ones(len(df), dtype=bool)
+    for column in STRING_COLUMNS:
+        clean &= _is_str(df[column], min_length=1 if column == "Employee_ID" else 0)
+
+    quantity_ok, quantity = _quantity(df["Quantity"])
+    date_ok, sale_date = _sale_date(df["Sale_Date"])
+    clean &= quantity_ok & date_ok
+
+    frame = pd.DataFrame({
+        "row": df.index[clean],
+        "employee_id": df["Employee_ID"].to_numpy()[clean],
+        "branch": df["Branch"].to_numpy()[clean],
+        "role": df["Role"].to_numpy()[clean],
+        "vehicle_model": df["Vehicle_Model"].to_numpy()[clean],
+        "quantity": quantity[clean] if quantity is not None else [],
+        "sale_date": sale_date[clean].dt.date.to_numpy(),
+        "vehicle_type": df["Vehicle_Type"].to_numpy()[clean],
+    }, columns=SALES_FRAME_COLUMNS)
+
+    # Row-by-row fallback for anything the column checks could not vouch for
+    fallback = []
+    failed_rows = []
+    for index, row in df[~clean].iterrows():
+        try:
+            sales_data = SalesRowSchema(**row_values(row))
+            fallback.append((
+                index,
+                sales_data.Employee_ID,
+                sales_data.Branch,
+                sales_data.Role,
+                sales_data.Vehicle_Model,
+                sales_data.Quantity,
+                sales_data.Sale_Date,
+                sales_data.Vehicle_Type
+            ))
+
+        except ValidationError as ve:
+            failed_rows.append({
+                "row": index + 1,
+                "error": ve.errors()
+            })
+
+    if fallback:
+        fallback = pd.DataFrame(fallback, columns=SALES_FRAME_COLUMNS)
+        if frame.empty:
+            frame = fallback
+        else:
+            frame = pd.concat([frame, fallback], ignore_index=True).sort_values(
+                "row", kind="stable", ignore_index=True
+            )
+
+    return frame, failed_rows
+
+
+############################ FINGERPRINTS #########################
+# Row hashes are defined in migrations/0010_ingestion_dedup.sql; the SQL
+# backfill there and row_hashes() must produce the same bytes.
+def file_sha256(f):
+    # Hex SHA-256 of a seekable upload, left rewound for parsing
+    digest = hashlib.sha256()
+    f.seek(0)
+    for block in iter(lambda: f.read(FILE_HASH_BLOCK), b""):
+        digest.update(block)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+class RowOccurrences:
+    # Running count of every natural key seen so far in one upload (sorted
+    # arrays of key hashes and counts), so the n-th identical row of a file
+    # gets occurrence n - 1 whichever chunk it falls in. Only needs to be
+    # consistent within an upload, hence Python's hash().
+
+    def __init__(self):
+        self._keys = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def number(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        occurrence = pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy()
+
+        if len(self._keys):
+            pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+            occurrence = occurrence + np.where(self._keys[pos] == keys, self._counts[pos], 0)
+
+        # Merge the chunk's keys in: bump known ones, insert new ones in order
+        chunk_keys, chunk_counts = np.unique(keys, return_counts=True)
+        if not len(self._keys):
+            self._keys, self._counts = chunk_keys, chunk_counts
+            return occurrence
+
+        pos = np.searchsorted(self._keys, chunk_keys)
+        known = self._keys[np.minimum(pos, len(self._keys) - 1)] == chunk_keys
+        self._counts[pos[known]] += chunk_counts[known]
+        self._keys = np.insert(self._keys, pos[~known], chunk_keys[~known])
+        self._counts = np.insert(self._counts, pos[~known], chunk_counts[~known])
+        return occurrence
+
+
+def row_hashes(frame, occurrences):
+    # 16-byte row_hash per frame row, numbering repeats via occurrences
+    keys = [
+        ROW_KEY_SEPARATOR.join((employee_id, vehicle_model, str(quantity), sale_date.isoformat(), vehicle_type))
+        for employee_id, vehicle_model, quantity, sale_date, vehicle_type in zip(
+            frame["employee_id"].tolist(),
+            frame["vehicle_model"].tolist(),
+            frame["quantity"].tolist(),
+            frame["sale_date"].tolist(),
+            frame["vehicle_type"].tolist()
+        )
+    ]
+    numbers = occurrences.number([hash(k) for k in keys])
+    return [
+        hashlib.sha256(f"{k}{ROW_KEY_SEPARATOR}{n}".encode()).digest()[:16]
+        for k, n in zip(keys, numbers.tolist())
+    ]
+
+
+############################ BULK WRITES #########################
+# Change tracking from the rows a batch actually inserted; rows skipped as
+# duplicates keep their old batch id and are not logged again. Each period's
+# change version is bumped first and locked until commit, so the version a
+# change is logged with orders it by commit (migrations/0002_change_tracking.sql).
+BUMP_CHANGE_VERSION = """
+    INSERT INTO sales_change_versions (period_month, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+LOG_BATCH_CHANGES = """
+    INSERT INTO sales_changes (period_month, employee_id, branch, change_version)
+    SELECT DISTINCT DATE_FORMAT(r.sale_date, '%%Y-%%m'), r.employee_id, p.branch, v.version
+    FROM sales_records r
+    JOIN salespeople p ON p.id = r.employee_id
+    JOIN sales_change_versions v ON v.period_month = DATE_FORMAT(r.sale_date, '%%Y-%%m')
+    WHERE r.ingest_batch = %s
+"""
+
+
+async def write_sales_frame(db, frame, hashes):
+    # hashes: row_hashes() of the frame. Returns (new rows, duplicate
+    # rows). Rows whose hash is already stored hit uq_sales_records_row_hash
+    # and become a no-op update; only the inserted ones reach the aggregates
+    # and the change log. Not INSERT IGNORE: that would also turn truncation,
+    # bad dates and NULL violations into warnings and store the row anyway.
+    if frame.empty:
+        return 0, 0
+
+    # New salespeople in one set-based upsert; the first row seen for an
+    # employee supplies branch/role and existing rows are left untouched
+    people = frame.drop_duplicates("employee_id")
+    await db.executemany(
+        """
+        INSERT INTO salespeople (id, branch, role)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE id = id
+        """,
+        list(zip(
+            people["employee_id"].tolist(),
+            people["branch"].tolist(),
+            people["role"].tolist()
+        ))
+    )
+
+    # Rows of this call are tagged so the aggregates can fold just them
+    batch_id = uuid.uuid4().hex
+    rows = list(zip(
+        frame["employee_id"].tolist(),
+        frame["vehicle_model"].tolist(),
+        frame["quantity"].tolist(),
+        frame["sale_date"].tolist(),
+        frame["vehicle_type"].tolist(),
+        [batch_id] * len(frame),
+        hashes
+    ))
+    inserted = 0
+    for i in range(0, len(rows), INGEST_INSERT_BATCH):
+        await db.executemany(
+            """
+            INSERT INTO sales_records
+            (employee_id, vehicle_model, quantity, sale_date, vehicle_type, ingest_batch, row_hash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = id
+            """,
+            rows[i:i + INGEST_INSERT_BATCH]
+        )
+        # Affected rows: 1 per insert, 0 per unchanged duplicate (the
+        # connections don't set CLIENT_FOUND_ROWS)
+        inserted += db.rowcount
+
+    if not inserted:
+        return 0, len(rows)
+
+    # Monthly aggregates, change tracking and the cache versions of the
+    # touched periods (sorted, so concurrent uploads lock them in order),
+    # same transaction
+    periods = sorted({f"{d.year:04d}-{d.month:02d}" for d in frame["sale_date"].tolist()})
+    await db.execute(FOLD_BATCH_UNITS, (batch_id,))
+    await db.execute(FOLD_BATCH_DAYS, (batch_id,))
+    await db.executemany(BUMP_CHANGE_VERSION, [(p,) for p in periods])
+    await db.execute(LOG_BATCH_CHANGES, (batch_id,))
+    await db.executemany(BUMP_CACHE_VERSION, [(p,) for p in periods])
+
+    return inserted, len(rows) - inserted
@@ -0,0 +1,225 @@
+import os
+import time
+import threading
+import dataclasses
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from services.engine import master_frame, incentive_totals
+from services.slab_index import SlabIndex
+from services.rule_plan import get_rule_plan
+from services.calculation import load_salespeople, change_version
+from services.aggregates import load_period_aggregates
+from services.periods import period_bounds
+from services.metrics import span
+from services.locks import SingleFlight
+
+SIMULATION_WORKERS = int(os.environ.get("SIMULATION_WORKERS", min(8, os.cpu_count() or 1)))
+SIMULATION_MAX_SCENARIOS = int(os.environ.get("SIMULATION_MAX_SCENARIOS", 100))
+# Periods kept in memory at once (least recently used dropped first)
+SIMULATION_SNAPSHOTS = int(os.environ.get("SIMULATION_SNAPSHOTS", 4))
+
+
+############################ PERIOD SNAPSHOTS #########################
+class PeriodSnapshot:
+    # A period's aggregates and salespeople master as loaded at a change
+    # version.
+    # Read-only once built, so scenarios share it across threads.
+
+    def __init__(self, period, version, units, sale_days, salespeople):
+        self.period = period
+        self.version = version
+        self.start_date, self.end_date = period_bounds(period)
+        self.units = units
+        self.sale_days = sale_days
+        self.master = master_frame(salespeople)
+        self._baseline = None
+
+    def baseline(self, plan):
+        # The current rule plan, kept until a new rule-set version is
+        # published
+        cached = self._baseline
+        if cached is None or cached[0] is not plan:
+            cached = (plan, evaluate(self, plan.slab_index, plan.params))
+            self._baseline = cached
+        return cached[1]
+
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+# Loads run outside _snapshots_lock, one per (period, version)
+_snapshot_loads = SingleFlight()
+
+
+def _load_snapshot(db, period, version):
+    start_date, end_date = period_bounds(period)
+    units, sale_days = load_period_aggregates(db, period, start_date, end_date)
+    snapshot = PeriodSnapshot(period, version, units, sale_days, load_salespeople(db))
+
+    with _snapshots_lock:
+        # A slower load of an older version doesn't replace a newer one
+        current = _snapshots.get(period)
+        if current is None or current.version <= version:
+            _snapshots[period] = snapshot
+            _snapshots.move_to_end(period)
+            while len(_snapshots) > SIMULATION_SNAPSHOTS:
+                _snapshots.popitem(last=False)
+    return snapshot
+
+
+def get_snapshot(db, period):
+    # Reused until the period's change version moves past the snapshot's
+    version = change_version(db, period)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(period)
+        if snapshot is not None and snapshot.version == version:
+            _snapshots.move_to_end(period)
+            return snapshot
+
+    snapshot, _ = _snapshot_loads.do((period, version), lambda: _load_snapshot(db, period, version))
+    return snapshot
+
+
+############################ SCENARIOS #########################
+def scenario_params(overrides, base):
+    # BonusParamsSchema applied over the current plan's BonusParams
+    values = {k: v for k, v in overrides.model_dump().items() if v is not None}
+
+    if "branch_milestones" in values:
+        milestones = values["branch_milestones"]
+        if any(len(m) != 2 for m in milestones):
+            raise ValueError("branch_milestones entries must be [threshold, amount]")
+        # np.select pays the first matching threshold, so highest first
+        values["branch_milestones"] = tuple(
+            (threshold, amount) for threshold, amount in sorted(milestones, key=lambda m: -m[0])
+        )
+    if "rank_bonus" in values:
+        values["rank_bonus"] = tuple(values["rank_bonus"])
+
+    return dataclasses.replace(base, **values)
+
+
+def scenario_slab_index(rules, start_date, end_date):
+    # RuleRowSchema rows -> SlabIndex, keeping only rules valid in the period
+    return SlabIndex([
+        {
+            "id": r.Rule_ID,
+            "role": r.Role,
+            "vehicle_type": r.Vehicle_Type,
+            "min_units": r.Min_Units,
+            "max_units": r.Max_Units,
+            "incentive_amount": r.Incentive_Amount_INR,
+            "bonus_per_unit": r.Bonus_Per_Unit_INR
+        }
+        for r in rules
+        if r.Valid_From <= end_date and r.Valid_To >= start_date
+    ])
+
+
+def evaluate(snapshot, slab_index, params):
+    ids, branches, totals = incentive_totals(
+        snapshot.units, snapshot.sale_days, snapshot.master, slab_index, params
+    )
+    by_branch = pd.Series(totals).groupby(pd.Series(branches, dtype=object), dropna=False).sum()
+    return {"employee_id": ids, "totals": totals, "by_branch": by_branch}
+
+
+def _compare(name, baseline, outcome, seconds):
+    base_total = float(baseline["totals"].sum())
+    total = float(outcome["totals"].sum())
+
+    # Employee order only depends on the snapshot, so totals line up
+    changed = int((np.abs(outcome["totals"] - baseline["totals"]) >= 0.005).sum())
+
+    branch_costs = pd.DataFrame({
+        "baseline_cost": baseline["by_branch"],
+        "scenario_cost": outcome["by_branch"]
+    }).fillna(0.0)
+    branch_costs["delta"] = branch_costs["scenario_cost"] - branch_costs["baseline_cost"]
+    branch_costs = branch_costs.iloc[np.argsort(-branch_costs["delta"].abs().to_numpy(), kind="stable")]
+
+    return {
+        "name": name,
+        "total_cost": round(total, 2),
+        "delta": round(total - base_total, 2),
+        "delta_pct": round((total - base_total) / base_total * 100, 2) if base_total else None,
+        "employees_paid": int((outcome["totals"] > 0).sum()),
+        "employees_changed": changed,
+        "seconds": round(seconds, 4),
+        "branches": [
+            {
+                "branch": None if pd.isna(branch) else branch,
+                "baseline_cost": round(float(row.baseline_cost), 2),
+                "scenario_cost": round(float(row.scenario_cost), 2),
+                "delta": round(float(row.delta), 2)
+            }
+            for branch, row in zip(branch_costs.index, branch_costs.itertuples())
+        ]
+    }
+
+
+############################ SIMULATION RUN #########################
+def simulate_period(conn, period, scenarios, workers=None):
+    # What-if costs of candidate rule sets / bonus parameters against the
+    # period's current payout. Reads only: nothing is written to the DB.
+    if len(scenarios) > SIMULATION_MAX_SCENARIOS:
+        raise ValueError(f"At most {SIMULATION_MAX_SCENARIOS} scenarios per request")
+
+    started = time.perf_counter()
+    db = conn.cursor()
+
+    # ------------------------------------
+    # 1. Snapshot + current rule plan
+    # ------------------------------------
+    with span("simulation", "snapshot"):
+        snapshot = get_snapshot(db, period)
+        plan = get_rule_plan(db, snapshot.start_date, snapshot.end_date)
+    conn.rollback()
+
+    if snapshot.units.empty:
+        return {
+            "status": "success",
+            "period": period,
+            "message": "No sales found for given period",
+            "scenarios": []
+        }
+
+    # ------------------------------------
+    # 2. Scenario inputs (validated before any work starts)
+    # ------------------------------------
+    prepared = [
+        (
+            s.name,
+            plan.slab_index if s.rules is None
+            else scenario_slab_index(s.rules, snapshot.start_date, snapshot.end_date),
+            scenario_params(s.params, plan.params)
+        )
+        for s in scenarios
+    ]
+
+    # ------------------------------------
+    # 3. Baseline, then scenarios in parallel
+    # ------------------------------------
+    with span("simulation", "scenarios"):
+        baseline = snapshot.baseline(plan)
+
+        def run(scenario):
+            name, index, params = scenario
+            scenario_started = time.perf_counter()
+            outcome = evaluate(snapshot, index, params)
+            return _compare(name, baseline, outcome, time.perf_counter() - scenario_started)
+
+        with ThreadPoolExecutor(max_workers=min(workers or SIMULATION_WORKERS, len(prepared))) as pool:
+            results = list(pool.map(run, prepared))
+
+    return {
+        "status": "success",
+        "period": period,
+        "snapshot_change_version": snapshot.version,
+        "rule_set_version": plan.version,
+        "employees": len(baseline["totals"]),
+        "baseline_cost": round(float(baseline["totals"].sum()), 2),
+        "scenarios": results,
+        "total_seconds": round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+
+############################ SLAB INTERVAL INDEX #########################
+def _rule_key(role, vehicle_type):
+    # A NULL role / vehicle type arrives as None, NaN or pd.NA depending on
+    # where it was read from; all of them are the one None key, as the
+    # per-row loop's None == None match had it
+    return (None if pd.isna(role) else role, None if pd.isna(vehicle_type) else vehicle_type)
+
+
+class SlabIndex:
+    # Structured slab rules keyed by (role, vehicle_type). For every key the
+    # unit axis is cut at each min_units and max_units + 1 boundary; inside a
+    # segment the winning slab (highest min_units, earliest rule on a tie) is
+    # constant, so a lookup is one searchsorted over the boundaries.
+
+    def __init__(self, rules):
+        rules = [r for r in rules if r["min_units"] is not None]
+
+        self.rule_ids = [r["id"] for r in rules]
+        self.min_units = np.array([r["min_units"] for r in rules], dtype=np.int64)
+        self.incentive_amount = np.array(
+            [r["incentive_amount"] or 0.0 for r in rules], dtype=float
+        )
+        self.bonus_per_unit = np.array(
+            [r["bonus_per_unit"] or 0.0 for r in rules], dtype=float
+        )
+        self._segments = {}
+
+        by_key = {}
+        for pos, r in enumerate(rules):
+            by_key.setdefault(_rule_key(r["role"], r["vehicle_type"]), []).append(pos)
+
+        for key, positions in by_key.items():
+            self._segments[key] = self._build_segments(rules, positions)
+
+    @staticmethod
+    def _build_segments(rules, positions):
+        # Candidates ordered by preference: highest min_units, then rule order
+        positions = sorted(positions, key=lambda p: (-rules[p]["min_units"], p))
+        mins = np.array([rules[p]["min_units"] for p in positions], dtype=np.int64)
+        maxs = np.array(
+            [np.iinfo(np.int64).max if rules[p]["max_units"] is None else rules[p]["max_units"]
+             for p in positions],
+            dtype=np.int64
+        )
+
+        bounds = np.unique(np.concatenate([mins, maxs[maxs < np.iinfo(np.int64).max] + 1]))
+        contains = (mins[None, :] <= bounds[:, None]) & (bounds[:, None] <= maxs[None, :])
+        first = contains.argmax(axis=1)
+        winners = np.where(contains.any(axis=1), np.array(positions)[first], -1)
+
+        return bounds, winners
+
+    def lookup(self, roles, vehicle_types, counts):
+        # Rule position for every (role, vehicle_type, count) row, -1 when no
+        # slab applies
+        counts = np.asarray(counts, dtype=np.int64)
+        matched = np.full(len(counts), -1, dtype=np.int64)
+
+        keys = pd.DataFrame({"role": roles, "vehicle_type": vehicle_types})
+        groups = keys.groupby(["role", "vehicle_type"], sort=False, dropna=False).indices
+
+        for key, rows in groups.items():
+            segment = self._segments.get(_rule_key(*key))
+            if segment is None:
+                continue
+
+            bounds, winners = segment
+            pos = np.searchsorted(bounds, counts[rows], side="right") - 1
+            matched[rows] = np.where(pos >= 0, winners[np.maximum(pos, 0)], -1)
+
+        return matched
+
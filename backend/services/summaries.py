@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+SUMMARY_PERCENTILES = [50, 90, 99]
+GROUP_TYPES = ["branch", "role"]
+
+
+############################ PERIOD SUMMARIES #########################
+# Dashboard stats for one period, computed from the rows the calculator is
+# about to commit and stored next to them, so the dashboard never reads
+# calculation_results. Ties for top performer go to the first row.
+def summarize_period(rows, salespeople):
+    # rows: (employee_id, total_incentive) in calculation_results order
+    ids = np.array([r[0] for r in rows], dtype=object)
+    totals = np.array([r[1] for r in rows], dtype=float)
+
+    if len(totals) == 0:
+        return None, []
+
+    median, p90, p99 = np.percentile(totals, SUMMARY_PERCENTILES)
+    summary = {
+        "total_incentive": float(totals.sum()),
+        "total_salespeople": len(totals),
+        "avg_incentive": float(totals.mean()),
+        "top_performer": ids[int(np.argmax(totals))],
+        "median_incentive": float(median),
+        "p90_incentive": float(p90),
+        "p99_incentive": float(p99)
+    }
+
+    master = {e["id"]: e for e in salespeople}
+    frame = pd.DataFrame({"employee_id": ids, "total": totals})
+    groups = []
+    for group_type in GROUP_TYPES:
+        frame["group"] = [(master.get(e) or {}).get(group_type) or "" for e in ids]
+        grouped = frame.groupby("group", sort=False)["total"]
+        stats = grouped.agg(["sum", "count", "mean", "idxmax"])
+        for value, s in stats.iterrows():
+            groups.append((
+                group_type,
+                value,
+                float(s["sum"]),
+                int(s["count"]),
+                float(s["mean"]),
+                ids[int(s["idxmax"])]
+            ))
+
+    return summary, groups
+
+
+def write_period_summary(db, period, salespeople):
+    # Replaces the period's summary rows; the caller commits. The totals are
+    # read back from calculation_results in the caller's transaction, so
+    # full and incremental runs both summarize the stored (FLOAT) values,
+    # the same ones the SQL fallback in routes/results.py aggregates.
+    db.execute(
+        "SELECT employee_id, total_incentive FROM calculation_results WHERE period_month=%s ORDER BY id",
+        (period,)
+    )
+    summary, groups = summarize_period(
+        [(r["employee_id"], r["total_incentive"]) for r in db.fetchall()],
+        salespeople
+    )
+
+    db.execute("DELETE FROM period_summaries WHERE period_month=%s", (period,))
+    db.execute("DELETE FROM period_group_summaries WHERE period_month=%s", (period,))
+    if summary is None:
+        return
+
+    db.execute(
+        """
+        INSERT INTO period_summaries
+        (period_month, total_incentive, total_salespeople, avg_incentive,
+         top_performer, median_incentive, p90_incentive, p99_incentive,
+         computed_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
+        """,
+        (
+            period,
+            summary["total_incentive"],
+            summary["total_salespeople"],
+            summary["avg_incentive"],
+            summary["top_performer"],
+            summary["median_incentive"],
+            summary["p90_incentive"],
+            summary["p99_incentive"]
+        )
+    )
+    db.executemany(
+        """
+        INSERT INTO period_group_summaries
+        (period_month, group_type, group_value, total_incentive,
+         total_salespeople, avg_incentive, top_performer)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        [(period, *g) for g in groups]
+    )